@@ -0,0 +1,257 @@
+import json
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+
+from flask import Blueprint, Response, abort, current_app, jsonify, request
+
+from asyncdb import async_db
+from model import db, Venue, Artist, Show, Genre, venue_genres, artist_genres
+from upcoming import upcoming_shows
+
+#----------------------------------------------------------------------------#
+# Statements.
+#----------------------------------------------------------------------------#
+
+# Queries are built as Core selects, which an AsyncSession runs as they are
+# and the exporter reuses on the app's session.
+
+VENUE_COLUMNS = (
+    Venue.id, Venue.name, Venue.city, Venue.state, Venue.address, Venue.phone,
+    Venue.image_link, Venue.website_link, Venue.facebook_link,
+    Venue.seeking_talent, Venue.seeking_description,
+)
+
+ARTIST_COLUMNS = (
+    Artist.id, Artist.name, Artist.city, Artist.state, Artist.phone,
+    Artist.image_link, Artist.website_link, Artist.facebook_link,
+    Artist.seeking_venue, Artist.seeking_description,
+)
+
+SHOW_COLUMNS = (
+    Show.id, Show.start_time,
+    Show.venue_id, Venue.name.label('venue_name'), Venue.image_link.label('venue_image_link'),
+    Show.artist_id, Artist.name.label('artist_name'), Artist.image_link.label('artist_image_link'),
+)
+
+# columns, model, genre association table and its owner column per collection
+OWNERS = {
+    'venues': (VENUE_COLUMNS, Venue, venue_genres, venue_genres.c.venue_id),
+    'artists': (ARTIST_COLUMNS, Artist, artist_genres, artist_genres.c.artist_id),
+}
+
+
+def owners_statement(kind, genre=None):
+    columns, model, association, owner_column = OWNERS[kind]
+    statement = db.select(list(columns))
+    if genre:
+        # served from the (genre_id, owner_id) primary key
+        statement = statement.select_from(model.__table__
+            .join(association, owner_column == model.id)
+            .join(Genre.__table__, Genre.id == association.c.genre_id)) \
+            .where(Genre.name == genre)
+    return statement.order_by(model.id)
+
+
+def owner_statement(kind, id):
+    columns, model, _, _ = OWNERS[kind]
+    return db.select(list(columns)).where(model.id == id)
+
+
+def genres_statement(kind, ids):
+    # genre names for a batch of venues or artists in one query
+    _, _, association, owner_column = OWNERS[kind]
+    return db.select([owner_column, Genre.name]) \
+        .select_from(association.join(Genre.__table__, Genre.id == association.c.genre_id)) \
+        .where(owner_column.in_(ids)).order_by(Genre.name)
+
+
+def shows_statement(*criteria):
+    statement = db.select(list(SHOW_COLUMNS)) \
+        .select_from(Show.__table__.join(Venue.__table__, Show.venue_id == Venue.id)
+                     .join(Artist.__table__, Show.artist_id == Artist.id))
+    for criterion in criteria:
+        statement = statement.where(criterion)
+    return statement.order_by(Show.start_time, Show.id)
+
+
+def calendar_range(span, date_arg):
+    """(start, days) of the day, or Monday-to-Sunday week, holding date_arg.
+
+    Raises ValueError for a malformed date.
+    """
+    day = date.fromisoformat(date_arg) if date_arg else datetime.utcnow().date()
+    if span == 'week':
+        day -= timedelta(days=day.weekday())
+    return datetime.combine(day, time.min), 7 if span == 'week' else 1
+
+
+def calendar_statement(start, days):
+    return db.select([upcoming_shows]) \
+        .where(upcoming_shows.c.start_time >= start) \
+        .where(upcoming_shows.c.start_time < start + timedelta(days=days)) \
+        .where(upcoming_shows.c.start_time > datetime.utcnow()) \
+        .order_by(upcoming_shows.c.start_time, upcoming_shows.c.show_id)
+
+#----------------------------------------------------------------------------#
+# Results.
+#----------------------------------------------------------------------------#
+
+def row_dict(row):
+    return {key: value.isoformat() if isinstance(value, datetime) else value
+            for key, value in row._asdict().items()}
+
+
+def group_genres(rows):
+    genres = defaultdict(list)
+    for owner_id, name in rows:
+        genres[owner_id].append(name)
+    return genres
+
+
+def owner_dict(row, genres, show_rows):
+    # a venue or artist with its genres and its shows split at the current time
+    data = row_dict(row)
+    data['genres'] = genres
+    current_time = datetime.utcnow()
+    data['past_shows'], data['upcoming_shows'] = [], []
+    for show in show_rows:
+        (data['upcoming_shows'] if show.start_time > current_time else data['past_shows']).append(row_dict(show))
+    data['past_shows_count'] = len(data['past_shows'])
+    data['upcoming_shows_count'] = len(data['upcoming_shows'])
+    return data
+
+
+def calendar_dict(span, start, days, rows):
+    shows = {(start + timedelta(days=i)).date().isoformat(): [] for i in range(days)}
+    for row in rows:
+        shows[row.start_time.date().isoformat()].append(row_dict(row))
+    return {
+        'span': span,
+        'start': start.isoformat(),
+        'end': (start + timedelta(days=days)).isoformat(),
+        'days': [{'date': key, 'shows': value} for key, value in shows.items()],
+    }
+
+
+async def json_lines(batches):
+    async for batch in batches:
+        yield ''.join(json.dumps(item) + '\n' for item in batch)
+
+
+async def json_array(batches):
+    yield '['
+    first = True
+    async for batch in batches:
+        yield ('' if first else ',') + ','.join(json.dumps(item) for item in batch)
+        first = False
+    yield ']\n'
+
+#----------------------------------------------------------------------------#
+# JSON API.
+#----------------------------------------------------------------------------#
+
+# The views are async (see asyncdb.py): they wait on the database through an
+# AsyncSession instead of holding a worker thread.
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+
+async def genres_by_owner(kind, ids):
+    return group_genres(await async_db.session().execute(genres_statement(kind, ids)))
+
+
+async def streamed_partitions(statement):
+    # rows from a server-side cursor, API_YIELD_PER at a time
+    batch_size = current_app.config['API_YIELD_PER']
+    result = await async_db.session().stream(statement.execution_options(max_row_buffer=batch_size))
+    async for rows in result.partitions(batch_size):
+        yield rows
+
+
+async def with_genres(partitions, kind):
+    # attaches genres to each batch of streamed rows with one query
+    async for rows in partitions:
+        batch = [row_dict(row) for row in rows]
+        genres = await genres_by_owner(kind, [item['id'] for item in batch])
+        for item in batch:
+            item['genres'] = genres.get(item['id'], [])
+        yield batch
+
+
+def stream_collection(batches):
+    """Streams batches of items as NDJSON (the default) or, with ?format=json, a JSON array."""
+    if request.args.get('format') == 'json':
+        return Response(json_array(batches), mimetype='application/json')
+    return Response(json_lines(batches), mimetype='application/x-ndjson')
+
+
+@api.route('/venues')
+async def venues():
+    partitions = streamed_partitions(owners_statement('venues', request.args.get('genre')))
+    return stream_collection(with_genres(partitions, 'venues'))
+
+
+@api.route('/artists')
+async def artists():
+    partitions = streamed_partitions(owners_statement('artists', request.args.get('genre')))
+    return stream_collection(with_genres(partitions, 'artists'))
+
+
+@api.route('/shows')
+async def shows():
+    criteria = [Show.start_time > datetime.utcnow()] if request.args.get('upcoming') else []
+    partitions = streamed_partitions(shows_statement(*criteria))
+    return stream_collection([row_dict(row) for row in rows] async for rows in partitions)
+
+
+async def owner_detail(kind, id, show_fk):
+    session = async_db.session()
+    row = (await session.execute(owner_statement(kind, id))).first()
+    if row is None:
+        abort(404)
+    genres = await genres_by_owner(kind, [id])
+    show_rows = await session.execute(shows_statement(show_fk == id))
+    return jsonify(owner_dict(row, genres[id], show_rows))
+
+
+@api.route('/venues/<int:venue_id>')
+async def venue(venue_id):
+    return await owner_detail('venues', venue_id, Show.venue_id)
+
+
+@api.route('/artists/<int:artist_id>')
+async def artist(artist_id):
+    return await owner_detail('artists', artist_id, Show.artist_id)
+
+
+@api.route('/shows/<int:show_id>')
+async def show(show_id):
+    row = (await async_db.session().execute(shows_statement(Show.id == show_id))).first()
+    if row is None:
+        abort(404)
+    return jsonify(row_dict(row))
+
+
+@api.route('/calendar/<any(day, week):span>')
+async def calendar(span):
+    """Upcoming shows of one day, or of the Monday-to-Sunday week, of ?date=.
+
+    Reads only the upcoming_shows view, so results can lag show writes by a
+    refresh.
+    """
+    try:
+        start, days = calendar_range(span, request.args.get('date'))
+    except ValueError:
+        abort(400)
+    rows = await async_db.session().execute(calendar_statement(start, days))
+    return jsonify(calendar_dict(span, start, days, rows))
+
+
+@api.errorhandler(400)
+def bad_request(error):
+    return jsonify({'error': 'bad request'}), 400
+
+
+@api.errorhandler(404)
+def not_found(error):
+    return jsonify({'error': 'not found'}), 404
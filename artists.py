@@ -0,0 +1,178 @@
+from flask import Blueprint, current_app, flash, redirect, render_template, request, url_for
+
+from cache import page_cache
+from conditional import conditional
+from model import db, Artist, Show, Genre, artist_genres
+from views import page_state, partition_shows, request_page, search_with_upcoming_counts, shows_state, \
+  stream_template, table_state
+
+blueprint = Blueprint('artists', __name__)
+
+#----------------------------------------------------------------------------#
+# Page state.
+#----------------------------------------------------------------------------#
+
+def artist_page_tags(artist_id):
+  # cache tags of every page that renders this artist's details
+  venue_ids = db.session.query(Show.venue_id).filter(Show.artist_id == artist_id).distinct()
+  return ['home', 'artists', 'shows', 'artist:{}'.format(artist_id)] + \
+    ['venue:{}'.format(venue_id) for venue_id, in venue_ids]
+
+
+def artists_state():
+  return page_state(*table_state(Artist))
+
+
+def artist_state(artist_id):
+  return page_state(*table_state(Artist, Artist.id == artist_id) + shows_state(Show.artist_id == artist_id))
+
+#----------------------------------------------------------------------------#
+# Controllers.
+#----------------------------------------------------------------------------#
+
+@blueprint.route('/artists')
+@conditional(artists_state)
+@page_cache.cached('artists')
+def artists():
+  # TODO: replace with real data returned from querying the database
+  data=db.session.query(Artist.id, Artist.name)
+  if request.args.get('genre'):
+    # served from the artist_genres (genre_id, artist_id) primary key
+    data = data.join(artist_genres, artist_genres.c.artist_id == Artist.id) \
+      .join(Genre, Genre.id == artist_genres.c.genre_id) \
+      .filter(Genre.name == request.args['genre'])
+  data = data.order_by(Artist.id).yield_per(current_app.config['LISTING_YIELD_PER'])
+
+  return stream_template('pages/artists.html', artists=data)
+
+
+@blueprint.route('/artists/search', methods=['POST'])
+def search_artists():
+  search_term = request.form.get('search_term', '')
+  response = search_with_upcoming_counts(Artist, search_term, request_page())
+
+  return render_template('pages/search_artists.html', data_returned=response, search_term=search_term)
+
+
+@blueprint.route('/artists/<int:artist_id>')
+@conditional(artist_state)
+@page_cache.cached('artist:{artist_id}')
+def show_artist(artist_id):
+  # two queries: the artist, then its shows joined with their venues
+  artist = Artist.query.options(
+      db.joinedload(Artist.genres),
+      db.selectinload(Artist.shows).joinedload(Show.venue)
+    ).get_or_404(artist_id)
+
+  past_shows, upcoming_shows = partition_shows(artist.shows, lambda show: {
+    "venue_id": show.venue_id,
+    "venue_name": show.venue.name,
+    "venue_image_link": show.venue.image_link,
+    "start_time": show.start_time
+    })
+
+  data = {
+        "id": artist.id,
+        "name": artist.name,
+        "genres": artist.genre_names,
+        "city": artist.city,
+        "state": artist.state,
+        "phone": artist.phone,
+        "website_link": artist.website_link,
+        "facebook_link": artist.facebook_link,
+        "seeking_venue": artist.seeking_venue,
+        "seeking_description":artist.seeking_description,
+        "image_link": artist.image_link,
+        "past_shows": past_shows,
+        "upcoming_shows": upcoming_shows,
+        "past_shows_count": len(past_shows),
+        "upcoming_shows_count": len(upcoming_shows)
+  }
+  return render_template('pages/show_artist.html', artist=data)
+
+#  Update
+#  ----------------------------------------------------------------
+
+
+@blueprint.route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+  # TODO: populate form with fields from artist with ID <artist_id>
+  # forms.py, and with it Flask-WTF and Babel, loads with the first form
+  from forms import ArtistForm
+
+  form = ArtistForm(request.form)
+  artist = db.session.query(Artist).filter(Artist.id == artist_id).one()
+
+  return render_template('forms/edit_artist.html', form=form, artist=artist)
+
+
+@blueprint.route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+  # TODO: take datas from the form submitted, and update existing
+
+        artist = Artist.query.get(artist_id)
+        artist.name = request.form['name']
+        artist.city = request.form['city']
+        artist.state = request.form['state']
+        artist.phone = request.form['phone']
+        artist.facebook_link = request.form['facebook_link']
+        artist.genres = Genre.get_or_create_all(request.form.getlist('genres'))
+        artist.image_link = request.form['image_link']
+        artist.website_link = request.form['website_link']
+
+        try:
+          db.session.commit()
+          page_cache.invalidate(*artist_page_tags(artist_id))
+        except:
+          db.session.rollback()
+          flash('An error occurred. Artist ' + request.form['name'] + ' could not be updated.')
+        finally:
+          db.session.close()
+
+        return redirect(url_for('.show_artist', artist_id=artist_id))
+
+#  Create Artist
+
+
+@blueprint.route('/artists/create', methods=['GET'])
+def create_artist_form():
+  from forms import ArtistForm
+  form = ArtistForm()
+  return render_template('forms/new_artist.html', form=form)
+
+
+@blueprint.route('/artists/create', methods=['POST'])
+def create_artist_submission():
+  # called upon submitting the new artist listing form
+  # TODO: insert form data as a new Venue record in the db, instead. modify data to be the data object returned from db insertion
+  from forms import ArtistForm
+  form = ArtistForm(request.form)
+
+  if form.validate():
+    try:
+      artist = Artist(
+        name = form.name.data,
+        genres = Genre.get_or_create_all(form.genres.data),
+        city = form.city.data,
+        state = form.state.data,
+        phone = form.phone.data,
+        facebook_link = form.facebook_link.data,
+        website_link = form.website_link.data,
+        seeking_venue = form.seeking_venue.data,
+        seeking_description = form.seeking_description.data,
+        image_link = form.image_link.data
+      )
+      db.session.add(artist)
+      db.session.commit()
+      page_cache.invalidate('home', 'artists')
+      # on successful db insert, flash success
+      flash('Artist ' + form.name.data + ' was successfully listed!')
+
+    except:
+      db.session.rollback()
+      flash('An error occurred. Artist ' + form.name.data + ' could not be listed.')
+
+    finally:
+      db.session.close()
+
+    return render_template('pages/home.html')
@@ -0,0 +1,41 @@
+"""ASGI entry point: the Flask app on a pool of threads per worker.
+
+    uvicorn asgi:application --workers 4
+
+Requests run on ASGI_WSGI_THREADS threads per worker, as under gunicorn.
+The JSON API's async views (see asyncdb.py) run on the worker's own event
+loop, so their database waits are multiplexed over the async driver's
+connections there, while the thread that serves the request only waits.
+
+Needs uvicorn[standard] (plain uvicorn's pure-Python HTTP parser stalls
+keep-alive responses on delayed ACKs) and a2wsgi, both in
+requirements-asgi.txt.
+"""
+import asyncio
+
+from a2wsgi import WSGIMiddleware
+
+from wsgi import app
+
+state = app.extensions['async_db']
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            state.use_loop(asyncio.get_running_loop())
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await state.dispose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+wsgi = WSGIMiddleware(app, workers=app.config['ASGI_WSGI_THREADS'])
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    await wsgi(scope, receive, send)
@@ -0,0 +1,158 @@
+import asyncio
+import contextvars
+import os
+import threading
+from concurrent.futures import Future
+from functools import wraps
+
+from flask import Response, current_app, g, stream_with_context
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from pool import async_engine_options
+
+#----------------------------------------------------------------------------#
+# Async reads.
+#----------------------------------------------------------------------------#
+
+ASYNC_DRIVERS = (
+    ('postgresql+psycopg2://', 'postgresql+asyncpg://'),
+    ('postgresql://', 'postgresql+asyncpg://'),
+    ('sqlite://', 'sqlite+aiosqlite://'),
+)
+
+
+def async_database_uri(uri):
+    """uri with its driver swapped for the matching async one."""
+    for prefix, replacement in ASYNC_DRIVERS:
+        if uri.startswith(prefix):
+            return replacement + uri[len(prefix):]
+    return uri
+
+
+class AsyncState:
+    """One app's event loop and async engines, kept in app.extensions['async_db']."""
+
+    def __init__(self, config):
+        self.config = config
+        self.loop = None
+        self.pid = None
+        self.engines = {}
+        self.lock = threading.Lock()
+
+    def use_loop(self, loop):
+        # engines connect on the loop they are first used on, so they start over
+        self.loop, self.pid, self.engines = loop, os.getpid(), {}
+
+    def event_loop(self):
+        # the ASGI server's loop, or else a daemon thread's, started on first
+        # use in each process since a forked worker cannot use its parent's
+        with self.lock:
+            if self.loop is None or self.pid != os.getpid():
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='async-db', daemon=True).start()
+                self.use_loop(loop)
+            return self.loop
+
+    def run(self, coroutine):
+        """Runs coroutine on the loop, in the caller's context, and waits for it."""
+        loop = self.event_loop()
+        context = contextvars.copy_context()
+        future = Future()
+
+        def done(task):
+            if task.cancelled():
+                future.cancel()
+            elif task.exception() is not None:
+                future.set_exception(task.exception())
+            else:
+                future.set_result(task.result())
+
+        def start():
+            # a task runs in a copy of the context it was created in
+            context.run(loop.create_task, coroutine).add_done_callback(done)
+        loop.call_soon_threadsafe(start)
+        return future.result()
+
+    def iterate(self, items):
+        # an async iterable as a plain iterator, each step run on the loop
+        iterator = items.__aiter__()
+        try:
+            while True:
+                try:
+                    yield self.run(iterator.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            if hasattr(iterator, 'aclose'):
+                self.run(iterator.aclose())
+
+    def engine(self, bind=None):
+        # called on the loop, so engines are only ever created from one thread
+        if bind not in self.engines:
+            if bind is None:
+                uri = self.config.get('ASYNC_DATABASE_URI') or \
+                    async_database_uri(self.config['SQLALCHEMY_DATABASE_URI'])
+            else:
+                uri = async_database_uri(self.config['SQLALCHEMY_BINDS'][bind])
+            self.engines[bind] = create_async_engine(uri, **async_engine_options(self.config, uri))
+        return self.engines[bind]
+
+    async def dispose(self):
+        for engine in self.engines.values():
+            await engine.dispose()
+        self.engines = {}
+
+
+class AsyncDatabase:
+    """Lets views be `async def` and read through an AsyncSession.
+
+    Flask waits for an async view (and any async hook or error handler) by
+    running it on one event loop per process: the ASGI server's, handed over
+    by asgi.py, or a daemon thread's. The request's context goes with it, so
+    request, g and current_app work as in any view, and the loop multiplexes
+    every thread's database waits over one pool of async connections.
+
+    session() reads from the replica the request was routed to, if any. An
+    async view can return a Response over an async iterable of strings; it
+    is streamed with the request context kept, each chunk produced on the
+    loop. The engines are separate from Flask-SQLAlchemy's, so an in-memory
+    SQLite database is not shared between them.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        state = app.extensions['async_db'] = AsyncState(app.config)
+        app.async_to_sync = self.async_to_sync
+        app.teardown_appcontext(self.close_session)
+        return state
+
+    @property
+    def state(self):
+        return current_app.extensions['async_db']
+
+    def async_to_sync(self, function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            state = self.state
+            rv = state.run(function(*args, **kwargs))
+            if isinstance(rv, Response) and hasattr(rv.response, '__aiter__'):
+                rv.response = stream_with_context(state.iterate(rv.response))
+            return rv
+        return wrapper
+
+    def session(self):
+        """The request's AsyncSession; call it from code running on the loop."""
+        if 'async_session' not in g:
+            g.async_session = AsyncSession(self.state.engine(g.get('db_replica')))
+        return g.async_session
+
+    def close_session(self, exception=None):
+        session = g.pop('async_session', None)
+        if session is not None:
+            self.state.run(session.close())
+
+
+async_db = AsyncDatabase()
@@ -0,0 +1,292 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from functools import partial, wraps
+
+from flask import Response, current_app, g, request, session
+
+#----------------------------------------------------------------------------#
+# Backends.
+#----------------------------------------------------------------------------#
+
+class CacheBackend:
+    """Interface every page cache backend implements.
+
+    Entries are plain strings stored under a key with a timeout in seconds.
+    Tags group keys so a write can drop every page that rendered a given
+    venue, artist or listing without knowing the pages' URLs.
+    """
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value, timeout):
+        raise NotImplementedError
+
+    def delete_many(self, *keys):
+        raise NotImplementedError
+
+    def tag(self, tag, key):
+        raise NotImplementedError
+
+    def pop_tag(self, tag):
+        """Forget a tag and return the keys that were registered under it."""
+        raise NotImplementedError
+
+
+class NullCache(CacheBackend):
+    """Caches nothing; used when CACHE_TYPE is 'null'."""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, timeout):
+        pass
+
+    def delete_many(self, *keys):
+        pass
+
+    def tag(self, tag, key):
+        pass
+
+    def pop_tag(self, tag):
+        return set()
+
+
+class SimpleCache(CacheBackend):
+    """In-process cache with per-entry TTL and least-recently-used eviction.
+
+    Each entry keeps the tags it was registered under, so an entry that is
+    evicted or found expired also leaves its tags' key sets.
+    """
+
+    def __init__(self, threshold=500):
+        self.threshold = threshold
+        self.entries = OrderedDict()
+        self.tags = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires, _ = entry
+            if expires <= time.monotonic():
+                self._remove(key)
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout):
+        with self.lock:
+            self._remove(key)
+            self.entries[key] = (value, time.monotonic() + timeout, set())
+            while len(self.entries) > self.threshold:
+                self._remove(next(iter(self.entries)))
+
+    def delete_many(self, *keys):
+        with self.lock:
+            for key in keys:
+                self._remove(key)
+
+    def tag(self, tag, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                entry[2].add(tag)
+                self.tags.setdefault(tag, set()).add(key)
+
+    def pop_tag(self, tag):
+        with self.lock:
+            return self.tags.pop(tag, set())
+
+    def _remove(self, key):
+        # drops an entry and its key from its tags' sets; callers hold the lock
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self.tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.tags[tag]
+
+
+class RedisCache(CacheBackend):
+    """Backend for a Redis server, or anything speaking the redis-py client API."""
+
+    def __init__(self, client, prefix='fyyur:'):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return value.decode('utf-8') if isinstance(value, bytes) else value
+
+    def set(self, key, value, timeout):
+        self.client.setex(self.prefix + key, max(int(timeout), 1), value)
+
+    def delete_many(self, *keys):
+        if keys:
+            self.client.delete(*[self.prefix + key for key in keys])
+
+    def tag(self, tag, key):
+        self.client.sadd(self.prefix + 'tag:' + tag, key)
+
+    def pop_tag(self, tag):
+        pipe = self.client.pipeline()
+        pipe.smembers(self.prefix + 'tag:' + tag)
+        pipe.delete(self.prefix + 'tag:' + tag)
+        keys, _ = pipe.execute()
+        return {key.decode('utf-8') if isinstance(key, bytes) else key for key in keys}
+
+#----------------------------------------------------------------------------#
+# Page cache.
+#----------------------------------------------------------------------------#
+
+class PageCacheState:
+    """One app's backend and settings, kept in app.extensions['page_cache']."""
+
+    def __init__(self, backend, default_timeout=300, max_page_size=1000000):
+        self.backend = backend
+        self.default_timeout = default_timeout
+        self.max_page_size = max_page_size
+        self.variants = []
+
+
+class PageCache:
+    """Caches rendered pages of read views and drops them by tag on writes.
+
+    Every app gets its own backend from init_app; the decorator and the
+    other methods act on the current app's.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        cache_type = app.config.get('CACHE_TYPE', 'simple')
+        if cache_type == 'simple':
+            backend = SimpleCache(app.config.get('CACHE_THRESHOLD', 500))
+        elif cache_type == 'redis':
+            import redis
+            backend = RedisCache(redis.Redis.from_url(app.config['CACHE_REDIS_URL']))
+        elif cache_type == 'null':
+            backend = NullCache()
+        else:
+            raise ValueError('Unknown CACHE_TYPE {!r}'.format(cache_type))
+        app.extensions['page_cache'] = PageCacheState(
+            backend, app.config.get('CACHE_DEFAULT_TIMEOUT', 300), app.config.get('CACHE_MAX_PAGE_SIZE', 1000000))
+
+    @property
+    def state(self):
+        return current_app.extensions['page_cache']
+
+    @property
+    def backend(self):
+        return self.state.backend
+
+    def cached(self, *tags, timeout=None):
+        """Caches a GET view's rendered page under its full path.
+
+        Tags are formatted with the view's arguments, e.g. 'venue:{venue_id}'.
+        Requests with pending flash messages bypass the cache, since the
+        layout renders those into the page. A view can shorten its page's
+        lifetime with expire_at() before it returns. A streamed page is
+        stored once it has been sent in full, if it is no longer than
+        CACHE_MAX_PAGE_SIZE characters.
+
+        Under @conditional each page is stored with the ETag it was rendered
+        for, and a page stored with another ETag is a miss: the state it was
+        rendered from has changed since, whatever its timeout says. Pages
+        read from a replica are kept apart from those read from the primary,
+        so a client reading its own writes never gets one that may lag.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(**kwargs):
+                state = self.state
+                if request.method != 'GET' or '_flashes' in session or isinstance(state.backend, NullCache):
+                    return view(**kwargs)
+                replica = g.get('db_replica')
+                key = 'page:' + self.variant() + (replica + ':' if replica else '') + request.full_path
+                etag = g.get('page_etag') or ''
+                page = state.backend.get(key)
+                if page is not None:
+                    page_etag, _, page = page.partition('\n')
+                    if page_etag != etag:
+                        page = None
+                if page is None:
+                    page = view(**kwargs)
+                    streamed = isinstance(page, Response) and page.is_streamed and page.status_code == 200
+                    if not isinstance(page, str) and not streamed:
+                        return page
+                    page_timeout = timeout or state.default_timeout
+                    if g.get('page_expires') is not None:
+                        page_timeout = min(page_timeout,
+                                           (g.page_expires - datetime.utcnow()).total_seconds())
+                    if page_timeout > 0:
+                        store = partial(self.store, state.backend, key, page_timeout,
+                                        [tag.format(**kwargs) for tag in tags], etag)
+                        if streamed:
+                            page.response = self.tee(page.response, store, state.max_page_size)
+                        else:
+                            store(page)
+                return page
+            return wrapper
+        return decorator
+
+    def store(self, backend, key, timeout, tags, etag, page):
+        # the ETag is hex, so the first newline ends it
+        backend.set(key, etag + '\n' + page, timeout)
+        for tag in tags:
+            backend.tag(tag, key)
+
+    def tee(self, chunks, store, max_page_size):
+        # passes a streamed page through, keeping a copy to store at the end
+        parts, length = [], 0
+        try:
+            for chunk in chunks:
+                if parts is not None:
+                    parts.append(chunk)
+                    length += len(chunk)
+                    if length > max_page_size:
+                        parts = None
+                yield chunk
+            if parts is not None:
+                store(''.join(parts))
+        finally:
+            # a client that disconnects closes this generator; close the
+            # page's own generator so it releases its request context
+            if hasattr(chunks, 'close'):
+                chunks.close()
+
+    def vary(self, app, function):
+        """Keys app's pages on function() too, for pages that differ by more than URL."""
+        app.extensions['page_cache'].variants.append(function)
+
+    def variant(self):
+        return ''.join(function() + '|' for function in self.state.variants)
+
+    def expire_at(self, when):
+        """Keeps the page being rendered cached no later than `when` (naive UTC).
+
+        Pages that split shows into past and upcoming call this with the next
+        upcoming start_time, the moment their partition stops being correct.
+        """
+        if g.get('page_expires') is None or when < g.page_expires:
+            g.page_expires = when
+
+    def invalidate(self, *tags):
+        backend = self.backend
+        keys = set()
+        for tag in tags:
+            keys |= backend.pop_tag(tag)
+        backend.delete_many(*keys)
+
+
+page_cache = PageCache()
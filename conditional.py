@@ -0,0 +1,59 @@
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import current_app, g, make_response, request, session
+
+from cache import page_cache
+
+#----------------------------------------------------------------------------#
+# Conditional GET.
+#----------------------------------------------------------------------------#
+
+def conditional(state):
+    """Adds ETag/Last-Modified to a GET view and answers 304 when they match.
+
+    `state(**view_args)` returns the values a page's content depends on, such
+    as max(updated_at) and row counts of the tables it renders. The ETag is a
+    hash of those values and the page_cache variant, and Last-Modified is the
+    latest datetime among them, so a matching client never gets the template
+    rendered. The ETag is left in g.page_etag for page_cache, which only
+    serves a cached page stored under the same one.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            if request.method != 'GET' or '_flashes' in session:
+                return view(**kwargs)
+
+            values = tuple(state(**kwargs))
+            etag = hashlib.md5(repr((current_app.config.get('ETAG_SALT'), page_cache.variant(), values))
+                               .encode('utf-8')).hexdigest()
+            stamps = [value for value in values if isinstance(value, datetime)]
+            last_modified = max(stamps).replace(microsecond=0, tzinfo=timezone.utc) if stamps else None
+
+            if not_modified(etag, last_modified):
+                response = current_app.response_class(status=304)
+            else:
+                g.page_etag = etag
+                response = make_response(view(**kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
+
+
+def not_modified(etag, last_modified):
+    # If-None-Match takes precedence over If-Modified-Since (RFC 7232 6)
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    since = request.if_modified_since
+    if since is None or last_modified is None:
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return last_modified <= since
@@ -0,0 +1,107 @@
+from datetime import datetime
+
+import click
+from flask.cli import AppGroup
+
+from cache import page_cache
+from model import db, Venue, Artist, Show, show_counter_update
+
+#----------------------------------------------------------------------------#
+# Show counters.
+#----------------------------------------------------------------------------#
+
+OWNERS = (
+    ('venues', Venue, Show.venue_id, 'venue:{}'),
+    ('artists', Artist, Show.artist_id, 'artist:{}'),
+)
+
+
+def rollover(now=None):
+    """Moves shows that have started since the last run from upcoming to past.
+
+    Only venues and artists whose next_show_at has passed are recomputed, so
+    a run costs one indexed lookup when nothing is due. Returns the number of
+    venues and artists updated.
+    """
+    now = now or datetime.utcnow()
+    updated = {}
+    for name, model, _, tag in OWNERS:
+        ids = [id for id, in db.session.query(model.id).filter(model.next_show_at <= now)]
+        if ids:
+            db.session.execute(show_counter_update(model, now).where(model.next_show_at <= now))
+            page_cache.invalidate(name, *[tag.format(id) for id in ids])
+        updated[name] = len(ids)
+    db.session.commit()
+    if any(updated.values()):
+        page_cache.invalidate('home')
+    return updated
+
+
+def drift(now=None):
+    """Compares every stored counter with a recount from Show.
+
+    Rows whose next_show_at has passed are skipped: they are only waiting for
+    the next rollover. Read-only. Returns {'venues': [...], 'artists': [...]}
+    listing (id, stored, actual) where stored and actual are
+    (upcoming, past, next_show_at) tuples.
+    """
+    now = now or datetime.utcnow()
+    result = {}
+    for name, model, fk, _ in OWNERS:
+        recount = db.session.query(
+            fk.label('owner_id'),
+            db.func.sum(db.case([(Show.start_time > now, 1)], else_=0)).label('upcoming'),
+            db.func.sum(db.case([(Show.start_time <= now, 1)], else_=0)).label('past'),
+            db.func.min(db.case([(Show.start_time > now, Show.start_time)], else_=None)).label('next_show_at'),
+        ).group_by(fk).subquery()
+        rows = db.session.query(
+            model.id, model.upcoming_shows_count, model.past_shows_count, model.next_show_at,
+            recount.c.upcoming, recount.c.past, recount.c.next_show_at,
+        ).outerjoin(recount, recount.c.owner_id == model.id) \
+            .filter(db.or_(model.next_show_at.is_(None), model.next_show_at > now)).order_by(model.id)
+        result[name] = [
+            (id, (upcoming, past, next_show_at), (actual_upcoming or 0, actual_past or 0, actual_next))
+            for id, upcoming, past, next_show_at, actual_upcoming, actual_past, actual_next in rows
+            if (upcoming, past, next_show_at) != (actual_upcoming or 0, actual_past or 0, actual_next)]
+    return result
+
+
+def rebuild(now=None):
+    """Recomputes every venue's and artist's counters from scratch."""
+    now = now or datetime.utcnow()
+    for _, model, _, _ in OWNERS:
+        db.session.execute(show_counter_update(model, now))
+    db.session.commit()
+    page_cache.invalidate('home', 'venues', 'artists')
+
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+counters_command = AppGroup('counters', help='Maintain the denormalized show counters.')
+
+
+@counters_command.command('rollover')
+def rollover_command():
+    """Roll shows that have started into the past counts; run every minute or so."""
+    updated = rollover()
+    click.echo('{venues} venues, {artists} artists rolled over'.format(**updated))
+
+
+@counters_command.command('check')
+@click.option('--fix', is_flag=True, help='Rebuild every counter from scratch when drift is found.')
+def check_command(fix):
+    """Recount shows for every venue and artist and report drifted counters."""
+    now = datetime.utcnow()
+    found = drift(now)
+    for name, rows in found.items():
+        for id, stored, actual in rows:
+            click.echo('{} {}: stored upcoming={} past={} next={}, actual upcoming={} past={} next={}'.format(
+                name, id, *stored + actual))
+    total = sum(len(rows) for rows in found.values())
+    click.echo('{} venues, {} artists drifted'.format(len(found['venues']), len(found['artists'])))
+    if total and fix:
+        rebuild(now)
+        click.echo('rebuilt')
+    elif total:
+        raise SystemExit(1)
@@ -0,0 +1,122 @@
+from datetime import timezone as tz
+from functools import lru_cache
+
+from flask import g, has_request_context, request
+
+from cache import page_cache
+
+#----------------------------------------------------------------------------#
+# Formatting. Babel is imported on first use, not with the app.
+#----------------------------------------------------------------------------#
+
+# the app's own format names; anything else is a Babel pattern, or one of
+# Babel's 'short' and 'long' locale formats
+FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+LOCALE_FORMATS = ('short', 'long')
+
+
+@lru_cache(maxsize=256)
+def compiled_pattern(format, locale):
+    """(DateTimePattern, Locale) for a format and locale, parsed once."""
+    from babel import Locale
+    from babel.dates import parse_pattern
+    return parse_pattern(FORMATS.get(format, format)), Locale.parse(locale)
+
+
+@lru_cache(maxsize=256)
+def timezone(name):
+    # raises LookupError, or ValueError, for an unknown zone
+    from babel.dates import get_timezone
+    return get_timezone(name)
+
+
+def format_value(value, format, locale, zone):
+    # naive datetimes are UTC, as stored
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=tz.utc)
+    value = value.astimezone(timezone(zone))
+    if format in LOCALE_FORMATS:
+        from babel.dates import format_datetime
+        return format_datetime(value, format, tzinfo=value.tzinfo, locale=locale)
+    pattern, babel_locale = compiled_pattern(format, locale)
+    return pattern.apply(value, babel_locale)
+
+#----------------------------------------------------------------------------#
+# Extension.
+#----------------------------------------------------------------------------#
+
+class DateFormatter:
+    """The `datetime` template filter, in the request's locale and timezone.
+
+    Formatted strings are memoized in an LRU of DATETIME_CACHE_SIZE entries
+    keyed by (value, format, locale, timezone). The locale is the best match
+    for Accept-Language among LOCALES, and the timezone comes from the
+    TIMEZONE_COOKIE cookie when that is set; both fall back to
+    BABEL_DEFAULT_LOCALE and BABEL_DEFAULT_TIMEZONE. With either selection
+    enabled, cached pages and ETags vary on the pair.
+
+    init_app gives each app a formatter of its own, configured from its
+    config, in app.extensions['date_formatter']; `date_formatter` itself
+    formats with the defaults.
+    """
+
+    def __init__(self, config=None):
+        config = config or {}
+        self.default_locale = config.get('BABEL_DEFAULT_LOCALE', 'en')
+        self.default_timezone = config.get('BABEL_DEFAULT_TIMEZONE', 'UTC')
+        self.locales = tuple(config.get('LOCALES') or (self.default_locale,))
+        self.timezone_cookie = config.get('TIMEZONE_COOKIE')
+        self.cached_format = lru_cache(maxsize=config.get('DATETIME_CACHE_SIZE', 4096))(format_value)
+
+    def init_app(self, app):
+        formatter = app.extensions['date_formatter'] = DateFormatter(app.config)
+        app.jinja_env.filters['datetime'] = formatter.format
+        if formatter.varies:
+            page_cache.vary(app, formatter.variant)
+            app.after_request(formatter.add_vary)
+
+    @property
+    def varies(self):
+        return len(self.locales) > 1 or bool(self.timezone_cookie)
+
+    def format(self, value, format='medium', locale=None, tzinfo=None):
+        if isinstance(value, str):
+            # only legacy callers pass strings; dateutil is imported for them
+            import dateutil.parser
+            value = dateutil.parser.parse(value)
+        if locale is None or tzinfo is None:
+            request_locale, request_timezone = self.selection()
+            locale, tzinfo = locale or request_locale, tzinfo or request_timezone
+        return self.cached_format(value, format, locale, tzinfo)
+
+    def selection(self):
+        """(locale, timezone name) for the current request."""
+        if not self.varies or not has_request_context():
+            return self.default_locale, self.default_timezone
+        selected = g.get('date_selection')
+        if selected is None:
+            locale = request.accept_languages.best_match(self.locales, self.default_locale)
+            zone = request.cookies.get(self.timezone_cookie) if self.timezone_cookie else None
+            try:
+                timezone(zone or self.default_timezone)
+            except (LookupError, ValueError):
+                zone = None
+            selected = g.date_selection = (locale, zone or self.default_timezone)
+        return selected
+
+    def variant(self):
+        return '{}|{}'.format(*self.selection())
+
+    def add_vary(self, response):
+        if len(self.locales) > 1:
+            response.vary.add('Accept-Language')
+        if self.timezone_cookie:
+            response.vary.add('Cookie')
+        return response
+
+
+date_formatter = DateFormatter()
@@ -0,0 +1,168 @@
+import csv
+import gzip
+import json
+import os
+from datetime import datetime
+
+import click
+from flask.cli import with_appcontext
+
+from api import genres_statement, group_genres
+from model import db, Venue, Artist, Show
+
+#----------------------------------------------------------------------------#
+# Writers.
+#----------------------------------------------------------------------------#
+
+class CsvWriter:
+    extension = 'csv.gz'
+
+    def __init__(self, path, columns, types):
+        self.file = gzip.open(path, 'wt', encoding='utf-8', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(columns)
+
+    def write(self, rows):
+        self.writer.writerows(
+            [value.isoformat() if isinstance(value, datetime) else value for value in row] for row in rows)
+
+    def close(self):
+        self.file.close()
+
+
+class NdjsonWriter:
+    extension = 'ndjson.gz'
+
+    def __init__(self, path, columns, types):
+        self.file = gzip.open(path, 'wt', encoding='utf-8')
+        self.columns = columns
+
+    def write(self, rows):
+        for row in rows:
+            self.file.write(json.dumps(dict(zip(self.columns, (
+                value.isoformat() if isinstance(value, datetime) else value for value in row)))) + '\n')
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter:
+    """Writes one Parquet row group per batch; needs the optional pyarrow package."""
+
+    extension = 'parquet'
+
+    def __init__(self, path, columns, types):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise click.ClickException('Parquet export needs pyarrow: pip install pyarrow')
+        arrow_types = {
+            int: pyarrow.int64(),
+            str: pyarrow.string(),
+            bool: pyarrow.bool_(),
+            datetime: pyarrow.timestamp('us'),
+        }
+        self.pyarrow = pyarrow
+        self.columns = columns
+        self.schema = pyarrow.schema([(column, arrow_types[type]) for column, type in zip(columns, types)])
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema, compression='snappy')
+
+    def write(self, rows):
+        columns = list(zip(*rows))
+        self.writer.write_table(self.pyarrow.Table.from_arrays(
+            [self.pyarrow.array(values, type=field.type) for values, field in zip(columns, self.schema)],
+            schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+WRITERS = {
+    'csv': CsvWriter,
+    'ndjson': NdjsonWriter,
+    'parquet': ParquetWriter,
+}
+
+#----------------------------------------------------------------------------#
+# Export.
+#----------------------------------------------------------------------------#
+
+# table, and whether its genres are exported as a comma-joined column
+TABLES = {
+    'venues': (Venue.__table__, True),
+    'artists': (Artist.__table__, True),
+    'shows': (Show.__table__, False),
+}
+
+
+def export_table(name, writer_class, output, since=None, after_id=None, batch_size=5000):
+    """Streams one table to output/<name>.<extension> from a server-side cursor.
+
+    Only rows updated after `since` and/or with an id above `after_id` are
+    exported when those watermarks are given. Returns the row count and the
+    new (max updated_at, max id) watermark.
+    """
+    table, with_genres = TABLES[name]
+    columns = [column.name for column in table.columns]
+    types = [column.type.python_type for column in table.columns]
+    if with_genres:
+        columns.append('genres')
+        types.append(str)
+
+    query = db.select([table]).order_by(table.c.id)
+    if since is not None:
+        query = query.where(table.c.updated_at > since)
+    if after_id is not None:
+        query = query.where(table.c.id > after_id)
+
+    path = os.path.join(output, '{}.{}'.format(name, writer_class.extension))
+    writer = writer_class(path, columns, types)
+    count, max_updated_at, max_id = 0, since, after_id
+    try:
+        result = db.session.execute(query.execution_options(stream_results=True))
+        while True:
+            rows = result.fetchmany(batch_size)
+            if not rows:
+                break
+            rows = [tuple(row) for row in rows]
+            if with_genres:
+                genres = group_genres(db.session.execute(genres_statement(name, [row[0] for row in rows])))
+                rows = [row + (','.join(genres.get(row[0], [])),) for row in rows]
+            writer.write(rows)
+            count += len(rows)
+            max_id = rows[-1][0]
+            batch_updated_at = max(row[columns.index('updated_at')] for row in rows)
+            if max_updated_at is None or batch_updated_at > max_updated_at:
+                max_updated_at = batch_updated_at
+    finally:
+        writer.close()
+    return path, count, max_updated_at, max_id
+
+
+@click.command('export')
+@click.argument('tables', nargs=-1, type=click.Choice(sorted(TABLES)))
+@click.option('--format', 'format', type=click.Choice(sorted(WRITERS)), default='csv', show_default=True)
+@click.option('--output', type=click.Path(file_okay=False), default='.', show_default=True,
+              help='Directory the export files are written to.')
+@click.option('--since', type=click.DateTime(['%Y-%m-%d', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%dT%H:%M:%S.%f']),
+              help='Only rows updated after this UTC timestamp.')
+@click.option('--after-id', type=int, help='Only rows with an id above this watermark.')
+@click.option('--batch-size', default=5000, show_default=True, help='Rows fetched per round trip.')
+@with_appcontext
+def export_command(tables, format, output, since, after_id, batch_size):
+    """Dump venues, artists and shows (all by default) as compressed files.
+
+    Incremental runs export one table at a time, passing the watermark the
+    previous run printed for it to --since or --after-id. Deletions are not
+    captured incrementally.
+    """
+    if (since is not None or after_id is not None) and len(tables) != 1:
+        # each table has its own watermark
+        raise click.UsageError('--since and --after-id need exactly one table.')
+    os.makedirs(output, exist_ok=True)
+    for name in tables or ('venues', 'artists', 'shows'):
+        path, count, max_updated_at, max_id = export_table(
+            name, WRITERS[format], output, since, after_id, batch_size)
+        click.echo('{}: {} rows -> {} (watermark --since {} --after-id {})'.format(
+            name, count, path, max_updated_at.isoformat() if max_updated_at else '-', max_id or '-'))
@@ -0,0 +1,290 @@
+import csv
+import json
+import sys
+import time
+from importlib import import_module
+from itertools import islice
+
+import click
+from flask.cli import with_appcontext
+from werkzeug.datastructures import MultiDict
+
+from cache import page_cache
+from model import db, Venue, Artist, Show, Genre, venue_genres, artist_genres, refresh_show_counters
+from upcoming import refresh_upcoming_shows
+
+#----------------------------------------------------------------------------#
+# Readers.
+#----------------------------------------------------------------------------#
+
+BOOLEAN_FIELDS = ('seeking_talent', 'seeking_venue')
+
+
+class Unreadable:
+    """Stands in for a line that could not be read as a row."""
+
+    def __init__(self, message):
+        self.errors = {'row': [message]}
+
+
+def read_rows(stream, format):
+    """Yields (line number, row dict) pairs from a CSV or NDJSON stream.
+
+    A line that cannot be read as a row (malformed JSON, or a CSV record with
+    more or fewer fields than the header) is yielded with an Unreadable in
+    place of the row, and rejected like any invalid row.
+    """
+    if format == 'csv':
+        reader = csv.DictReader(stream)
+        for line, row in enumerate(reader, start=2):
+            # DictReader files surplus values under None and fills missing ones with None
+            extra, missing = row.pop(None, ()), sum(value is None for value in row.values())
+            if extra or missing:
+                expected = len(reader.fieldnames)
+                row = Unreadable('Expected {} fields, got {}.'.format(expected, expected + len(extra) - missing))
+            yield line, row
+    else:
+        for line, text in enumerate(stream, start=1):
+            if text.strip():
+                try:
+                    row = json.loads(text)
+                except ValueError as error:
+                    row = Unreadable('Not valid JSON: {}.'.format(error))
+                else:
+                    if not isinstance(row, dict):
+                        row = Unreadable('Not a JSON object.')
+                yield line, row
+
+
+def form_data(row):
+    # shapes a raw row the way the browser would post it to the matching form
+    data = MultiDict()
+    for key, value in row.items():
+        if value is None:
+            continue
+        if key == 'genres':
+            names = value if isinstance(value, list) else str(value).split(',')
+            for name in names:
+                if name.strip():
+                    data.add('genres', name.strip())
+        elif key in BOOLEAN_FIELDS:
+            if str(value).strip().lower() not in ('', '0', 'false', 'no', 'n'):
+                data.add(key, 'y')
+        elif key == 'start_time':
+            data.add(key, str(value).replace('T', ' ')[:19])
+        else:
+            data.add(key, str(value))
+    return data
+
+#----------------------------------------------------------------------------#
+# Loaders.
+#----------------------------------------------------------------------------#
+
+def allocate_ids(table, count):
+    # reserves primary keys up front so association rows can be written with
+    # executemany instead of reading ids back one insert at a time
+    if db.engine.dialect.name == 'postgresql':
+        sequence = db.func.pg_get_serial_sequence('"{}"'.format(table.name), 'id')
+        rows = db.session.execute(
+            db.select([db.func.nextval(sequence)]).select_from(db.func.generate_series(1, count)))
+        return [id for id, in rows]
+    start = (db.session.query(db.func.max(table.c.id)).scalar() or 0) + 1
+    return list(range(start, start + count))
+
+
+def genre_ids(names):
+    # resolves genre names for a whole batch, inserting the missing ones
+    names = set(names)
+    known = dict(db.session.query(Genre.name, Genre.id).filter(Genre.name.in_(names))) if names else {}
+    missing = sorted(names - set(known))
+    if missing:
+        db.session.execute(Genre.__table__.insert(), [{'name': name} for name in missing])
+        known.update(db.session.query(Genre.name, Genre.id).filter(Genre.name.in_(missing)))
+    return known
+
+
+class Loader:
+    """Validates rows with a form and writes accepted ones in batches."""
+
+    # a form in forms.py, which is imported (with Flask-WTF) only to load
+    form_name = None
+    # columns a row must carry even where the form would fall back to a default
+    required = ()
+
+    def __init__(self):
+        self.tags = set()
+        self.form_class = getattr(import_module('forms'), self.form_name)
+
+    def validate(self, batch):
+        accepted, rejected = [], []
+        for line, row in batch:
+            if isinstance(row, Unreadable):
+                rejected.append((line, row.errors))
+                continue
+            missing = [key for key in self.required if not row.get(key)]
+            if missing:
+                rejected.append((line, {key: ['This field is required.'] for key in missing}))
+                continue
+            form = self.form_class(formdata=form_data(row), meta={'csrf': False})
+            if form.validate():
+                accepted.append((line, form))
+            else:
+                rejected.append((line, form.errors))
+        return accepted, rejected
+
+    def load(self, accepted):
+        raise NotImplementedError
+
+
+class OwnerLoader(Loader):
+    model = None
+    association = None
+    owner_key = None
+    columns = ()
+
+    def load(self, accepted):
+        table = self.model.__table__
+        ids = allocate_ids(table, len(accepted))
+        genres = genre_ids(name for _, form in accepted for name in form.genres.data)
+
+        rows, links = [], []
+        for id, (_, form) in zip(ids, accepted):
+            row = {column: getattr(form, column).data for column in self.columns}
+            row['id'] = id
+            rows.append(row)
+            links.extend({'genre_id': genres[name], self.owner_key: id} for name in set(form.genres.data))
+
+        db.session.execute(table.insert(), rows)
+        if links:
+            db.session.execute(self.association.insert(), links)
+        return []
+
+
+class VenueLoader(OwnerLoader):
+    form_name = 'VenueForm'
+    model = Venue
+    association = venue_genres
+    owner_key = 'venue_id'
+    columns = ('name', 'city', 'state', 'address', 'phone', 'image_link', 'facebook_link',
+               'website_link', 'seeking_talent', 'seeking_description')
+
+    def __init__(self):
+        super().__init__()
+        self.tags.update(['home', 'venues'])
+
+
+class ArtistLoader(OwnerLoader):
+    form_name = 'ArtistForm'
+    model = Artist
+    association = artist_genres
+    owner_key = 'artist_id'
+    columns = ('name', 'city', 'state', 'phone', 'image_link', 'facebook_link',
+               'website_link', 'seeking_venue', 'seeking_description')
+
+    def __init__(self):
+        super().__init__()
+        self.tags.update(['home', 'artists'])
+
+
+class ShowLoader(Loader):
+    form_name = 'ShowForm'
+    required = ('venue_id', 'artist_id', 'start_time')
+
+    def __init__(self):
+        super().__init__()
+        self.tags.update(['shows', 'venues'])
+
+    def load(self, accepted):
+        # venue and artist references are checked for the whole batch at once
+        shows, rejected = [], []
+        for line, form in accepted:
+            try:
+                shows.append((line, int(form.venue_id.data), int(form.artist_id.data), form.start_time.data))
+            except (TypeError, ValueError):
+                rejected.append((line, {'venue_id/artist_id': ['Not a valid id.']}))
+        venue_ids = {id for id, in db.session.query(Venue.id).filter(Venue.id.in_({show[1] for show in shows}))}
+        artist_ids = {id for id, in db.session.query(Artist.id).filter(Artist.id.in_({show[2] for show in shows}))}
+
+        rows = []
+        for line, venue_id, artist_id, start_time in shows:
+            if venue_id not in venue_ids:
+                rejected.append((line, {'venue_id': ['No venue with id {}.'.format(venue_id)]}))
+            elif artist_id not in artist_ids:
+                rejected.append((line, {'artist_id': ['No artist with id {}.'.format(artist_id)]}))
+            else:
+                rows.append({'venue_id': venue_id, 'artist_id': artist_id, 'start_time': start_time})
+                self.tags.update(['venue:{}'.format(venue_id), 'artist:{}'.format(artist_id)])
+        if rows:
+            db.session.execute(Show.__table__.insert(), rows)
+            refresh_show_counters(db.session, {row['venue_id'] for row in rows}, {row['artist_id'] for row in rows})
+        return rejected
+
+
+LOADERS = {
+    'venues': VenueLoader,
+    'artists': ArtistLoader,
+    'shows': ShowLoader,
+}
+
+
+def import_rows(kind, rows, batch_size=1000, on_reject=None):
+    """Imports (line, row) pairs in batched transactions.
+
+    Returns the number of rows inserted and rejected. on_reject(line, errors)
+    is called for each rejected row; a batch that fails to commit is rolled
+    back and all of its rows are reported as rejected.
+    """
+    loader = LOADERS[kind]()
+    rows = iter(rows)
+    inserted = rejected = 0
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        accepted, invalid = loader.validate(batch)
+        try:
+            unresolved = loader.load(accepted) if accepted else []
+            db.session.commit()
+            inserted += len(accepted) - len(unresolved)
+            invalid += unresolved
+        except Exception as error:
+            db.session.rollback()
+            invalid = [(line, {'batch': [str(error)]}) for line, _ in batch]
+        rejected += len(invalid)
+        if on_reject:
+            for line, errors in sorted(invalid, key=lambda reject: reject[0]):
+                on_reject(line, errors)
+    if kind == 'shows' and inserted:
+        # core inserts skip the session hook that refreshes it on ORM writes
+        with db.engine.begin() as connection:
+            refresh_upcoming_shows(connection)
+    page_cache.invalidate(*loader.tags)
+    return inserted, rejected
+
+#----------------------------------------------------------------------------#
+# Command.
+#----------------------------------------------------------------------------#
+
+@click.command('import')
+@click.argument('kind', type=click.Choice(sorted(LOADERS)))
+@click.argument('source', type=click.File('r', encoding='utf-8'))
+@click.option('--format', 'format', type=click.Choice(['csv', 'ndjson']),
+              help='Input format; defaults to the file extension.')
+@click.option('--batch-size', default=1000, show_default=True,
+              help='Rows validated and committed per transaction.')
+@click.option('--rejects', type=click.File('w', encoding='utf-8'), default=sys.stderr,
+              help='Where to write one JSON line per rejected row (default: stderr).')
+@with_appcontext
+def import_command(kind, source, format, batch_size, rejects):
+    """Bulk load venues, artists or shows from a CSV or NDJSON file."""
+    if format is None:
+        format = 'ndjson' if source.name.endswith(('.ndjson', '.jsonl')) else 'csv'
+
+    def on_reject(line, errors):
+        rejects.write(json.dumps({'line': line, 'errors': errors}) + '\n')
+
+    start = time.perf_counter()
+    inserted, rejected = import_rows(kind, read_rows(source, format), batch_size, on_reject)
+    elapsed = time.perf_counter() - start
+    click.echo('{} {} imported, {} rejected in {:.2f}s ({:.0f} rows/s)'.format(
+        inserted, kind, rejected, elapsed, (inserted + rejected) / elapsed if elapsed else 0))
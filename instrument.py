@@ -0,0 +1,188 @@
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+
+from flask import current_app, g, has_app_context, has_request_context, request
+from jinja2 import Template
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+request_log = logging.getLogger('fyyur.requests')
+slow_query_log = logging.getLogger('fyyur.slow_queries')
+
+#----------------------------------------------------------------------------#
+# Per-request profile.
+#----------------------------------------------------------------------------#
+
+class RequestProfile:
+    """SQL statements and template render time recorded during one request."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = []
+
+    @property
+    def db_time(self):
+        return sum(duration for _, _, duration in self.queries)
+
+    def slowest(self, count=3):
+        return sorted(self.queries, key=lambda query: query[2], reverse=True)[:count]
+
+    def repeated(self, threshold):
+        """Statements run at least threshold times with different parameters."""
+        parameters = defaultdict(set)
+        for statement, params, _ in self.queries:
+            parameters[statement].add(repr(params))
+        return {statement: len(seen) for statement, seen in parameters.items() if len(seen) >= threshold}
+
+
+def current_profile():
+    return g.get('request_profile') if has_request_context() else None
+
+
+def abbreviate(text, length=200):
+    text = ' '.join(str(text).split())
+    return text if len(text) <= length else text[:length - 3] + '...'
+
+#----------------------------------------------------------------------------#
+# Hooks.
+#----------------------------------------------------------------------------#
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info['query_start'].pop()
+    profile = current_profile()
+    if profile is not None:
+        profile.queries.append((statement, parameters, duration))
+    settings = current_app.extensions.get('instrumentation') if has_app_context() else None
+    if settings is not None and duration >= settings.slow_query_seconds:
+        slow_query_log.warning(json.dumps({
+            'duration_ms': round(duration * 1000, 2),
+            'statement': abbreviate(statement, 1000),
+            'parameters': abbreviate(parameters),
+            'path': request.path if has_request_context() else None,
+        }))
+
+
+def render_time():
+    """Seconds spent rendering templates so far in this request."""
+    return g.get('render_time', 0.0)
+
+
+class TimedTemplate(Template):
+    """Adds its render time to the request's running total (see render_time)."""
+
+    def render(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            if has_request_context():
+                g.render_time = g.get('render_time', 0.0) + time.perf_counter() - start
+
+    def generate(self, *args, **kwargs):
+        # a streamed render counts the time spent producing each chunk, which
+        # includes rows the template pulls from a server-side cursor
+        chunks = super().generate(*args, **kwargs)
+        elapsed = 0.0
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    chunk = next(chunks)
+                except StopIteration:
+                    return
+                finally:
+                    elapsed += time.perf_counter() - start
+                yield chunk
+        finally:
+            if has_request_context():
+                g.render_time = g.get('render_time', 0.0) + elapsed
+
+#----------------------------------------------------------------------------#
+# Extension.
+#----------------------------------------------------------------------------#
+
+class Instrumentation:
+    """Records query count, DB time and render time for every request.
+
+    Each response gets a Server-Timing header, and a JSON line with the
+    totals and slowest statements is written to the 'fyyur.requests'
+    logger once the request (including a streamed body) has finished.
+    Statements slower than SLOW_QUERY_MS go to the 'fyyur.slow_queries'
+    logger. With SQL_DETECT_N_PLUS_ONE, a statement repeated with
+    different parameters SQL_N_PLUS_ONE_THRESHOLD times or more in one
+    request is logged as a likely N+1.
+
+    init_app registers an Instrumentation of the app's own, configured from
+    its config, in app.extensions['instrumentation'].
+    """
+
+    def __init__(self, config=None):
+        config = config or {}
+        self.slow_query_seconds = config.get('SLOW_QUERY_MS', 200) / 1000.0
+        self.n_plus_one_threshold = config.get('SQL_N_PLUS_ONE_THRESHOLD', 5)
+        self.detect_n_plus_one = config.get('SQL_DETECT_N_PLUS_ONE', config.get('DEBUG', False))
+
+    def init_app(self, app):
+        if not app.config.get('SQL_INSTRUMENTATION', True):
+            return
+        instance = app.extensions['instrumentation'] = Instrumentation(app.config)
+
+        for logger, path in ((request_log, app.config.get('REQUEST_LOG')),
+                             (slow_query_log, app.config.get('SLOW_QUERY_LOG'))):
+            # one handler per file, however many apps are created
+            if path and not any(getattr(handler, 'baseFilename', None) == os.path.abspath(path)
+                                for handler in logger.handlers):
+                handler = logging.FileHandler(path)
+                handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
+                logger.addHandler(handler)
+                logger.setLevel(logging.INFO)
+
+        app.jinja_env.template_class = TimedTemplate
+        app.before_request(instance.start_profile)
+        app.after_request(instance.server_timing)
+        app.teardown_request(instance.log_profile)
+
+    def start_profile(self):
+        g.request_profile = RequestProfile()
+
+    def server_timing(self, response):
+        profile = g.get('request_profile')
+        if profile is not None:
+            response.headers.add('Server-Timing', 'db;dur={:.2f};desc="{} queries"'.format(
+                profile.db_time * 1000, len(profile.queries)))
+            response.headers.add('Server-Timing', 'render;dur={:.2f}'.format(render_time() * 1000))
+            response.headers.add('Server-Timing', 'app;dur={:.2f}'.format(
+                (time.perf_counter() - profile.start) * 1000))
+        return response
+
+    def log_profile(self, error=None):
+        profile = g.pop('request_profile', None)
+        if profile is None:
+            return
+        request_log.info(json.dumps({
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'endpoint': request.endpoint,
+            'duration_ms': round((time.perf_counter() - profile.start) * 1000, 2),
+            'queries': len(profile.queries),
+            'db_ms': round(profile.db_time * 1000, 2),
+            'render_ms': round(render_time() * 1000, 2),
+            'slowest': [{'duration_ms': round(duration * 1000, 2), 'statement': abbreviate(statement)}
+                        for statement, _, duration in profile.slowest()],
+        }))
+        if self.detect_n_plus_one:
+            for statement, count in profile.repeated(self.n_plus_one_threshold).items():
+                request_log.warning('Possible N+1 on {}: {} statements like {}'.format(
+                    request.endpoint, count, abbreviate(statement)))
+
+
+instrumentation = Instrumentation()
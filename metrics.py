@@ -0,0 +1,300 @@
+import glob
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import defaultdict
+
+from flask import Blueprint, Response, current_app, g, request
+
+from instrument import TimedTemplate, render_time
+from pool import local_only
+
+#----------------------------------------------------------------------------#
+# Value stores.
+#----------------------------------------------------------------------------#
+
+class ProcessValues:
+    """Metric values held in this process's memory (single process servers)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = defaultdict(float)
+
+    def inc(self, key, amount=1.0):
+        with self.lock:
+            self.values[key] += amount
+
+    def items(self):
+        with self.lock:
+            return list(self.values.items())
+
+
+class FileValues:
+    """Metric values in a memory-mapped file per process, for multi-worker servers.
+
+    Each worker only ever writes its own <kind>_<pid>.db file, so increments
+    cost a dict lookup and an 8 byte write; /metrics sums every worker's file.
+    Entries are appended as (key length, key, padding, double) and the used
+    size in the header is bumped last, so readers never see half an entry.
+    """
+
+    header = struct.Struct('<Q')
+    key_length = struct.Struct('<I')
+    value = struct.Struct('<d')
+
+    def __init__(self, directory, kind):
+        self.directory = directory
+        self.kind = kind
+        self.lock = threading.Lock()
+        self.pid = None
+
+    def open(self):
+        # (re)opened lazily so a worker forked from a preloaded master gets its own file
+        self.pid = os.getpid()
+        self.path = os.path.join(self.directory, '{}_{}.db'.format(self.kind, self.pid))
+        self.file = open(self.path, 'w+b')
+        self.file.truncate(64 * 1024)
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        self.used = self.header.size
+        self.header.pack_into(self.map, 0, self.used)
+        self.positions = {}
+
+    def inc(self, key, amount=1.0):
+        with self.lock:
+            if self.pid != os.getpid():
+                self.open()
+            position = self.positions.get(key)
+            if position is None:
+                position = self.append(key)
+            self.value.pack_into(self.map, position, self.value.unpack_from(self.map, position)[0] + amount)
+
+    def append(self, key):
+        encoded = key.encode('utf-8')
+        padded = self.key_length.size + len(encoded) + (-(self.key_length.size + len(encoded)) % 8)
+        size = padded + self.value.size
+        if self.used + size > len(self.map):
+            self.map.close()
+            self.file.truncate(max(2 * (self.used + size), 64 * 1024))
+            self.map = mmap.mmap(self.file.fileno(), 0)
+        self.key_length.pack_into(self.map, self.used, len(encoded))
+        self.map[self.used + self.key_length.size:self.used + self.key_length.size + len(encoded)] = encoded
+        position = self.used + padded
+        self.value.pack_into(self.map, position, 0.0)
+        self.used += size
+        self.header.pack_into(self.map, 0, self.used)
+        self.positions[key] = position
+        return position
+
+    def items(self):
+        totals = defaultdict(float)
+        for path in glob.glob(os.path.join(self.directory, '{}_*.db'.format(self.kind))):
+            with open(path, 'rb') as file:
+                data = file.read()
+            if len(data) < self.header.size:
+                continue
+            used, offset = self.header.unpack_from(data, 0)[0], self.header.size
+            while offset < used:
+                length = self.key_length.unpack_from(data, offset)[0]
+                key = data[offset + self.key_length.size:offset + self.key_length.size + length].decode('utf-8')
+                offset += self.key_length.size + length + (-(self.key_length.size + length) % 8)
+                totals[key] += self.value.unpack_from(data, offset)[0]
+                offset += self.value.size
+        return list(totals.items())
+
+#----------------------------------------------------------------------------#
+# Metrics.
+#----------------------------------------------------------------------------#
+
+# upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+
+class Metric:
+    """A named family of samples; values live in a shared store keyed by JSON."""
+
+    type = None
+
+    def __init__(self, name, help, labelnames):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.store = None
+        self.keys = {}
+
+    def key(self, labels, suffix='', bucket=None):
+        # label values are tuples so encoded keys can be memoized
+        try:
+            return self.keys[labels, suffix, bucket]
+        except KeyError:
+            key = self.keys[labels, suffix, bucket] = json.dumps([self.name + suffix, labels, bucket])
+            return key
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, labels, amount=1.0):
+        self.store.inc(self.key(labels), amount)
+
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def inc(self, labels, amount=1.0):
+        self.store.inc(self.key(labels), amount)
+
+    def dec(self, labels, amount=1.0):
+        self.store.inc(self.key(labels), -amount)
+
+
+class Histogram(Metric):
+    """Stores one count per bucket; they are made cumulative at exposition."""
+
+    type = 'histogram'
+
+    def __init__(self, name, help, labelnames, buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = buckets
+
+    def observe(self, labels, value):
+        for bound in self.buckets:
+            if value <= bound:
+                break
+        self.store.inc(self.key(labels, '_bucket', bound))
+        self.store.inc(self.key(labels, '_sum'), value)
+        self.store.inc(self.key(labels, '_count'))
+
+
+def format_value(value):
+    return '+Inf' if value == float('inf') else repr(float(value))
+
+
+def format_labels(names, values, bucket=None):
+    pairs = ['{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+             for name, value in zip(names, values)]
+    if bucket is not None:
+        pairs.append('le="{}"'.format(format_value(bucket)))
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def exposition(metrics, samples):
+    """Renders summed samples in the Prometheus text format (version 0.0.4)."""
+    by_name = defaultdict(dict)
+    for key, value in samples:
+        name, labels, bucket = json.loads(key)
+        by_name[name][(tuple(labels), bucket)] = value
+
+    lines = []
+    for metric in metrics:
+        lines.append('# HELP {} {}'.format(metric.name, metric.help))
+        lines.append('# TYPE {} {}'.format(metric.name, metric.type))
+        if isinstance(metric, Histogram):
+            counts = by_name[metric.name + '_bucket']
+            for labels in sorted({labels for labels, _ in counts}):
+                total = 0.0
+                for bound in metric.buckets:
+                    total += counts.get((labels, bound), 0.0)
+                    lines.append('{}_bucket{} {}'.format(
+                        metric.name, format_labels(metric.labelnames, labels, bound), format_value(total)))
+                for suffix in ('_sum', '_count'):
+                    lines.append('{}{}{} {}'.format(metric.name, suffix, format_labels(metric.labelnames, labels),
+                                                    format_value(by_name[metric.name + suffix].get((labels, None), 0.0))))
+        else:
+            for (labels, _), value in sorted(by_name[metric.name].items()):
+                lines.append('{}{} {}'.format(metric.name, format_labels(metric.labelnames, labels), format_value(value)))
+    return '\n'.join(lines) + '\n'
+
+#----------------------------------------------------------------------------#
+# Extension.
+#----------------------------------------------------------------------------#
+
+class Metrics:
+    """Request metrics for every route, served on /metrics for Prometheus.
+
+    With METRICS_DIR set, each worker process writes its values to files in
+    that directory and /metrics sums them, so any worker answers for all of
+    them. Empty the directory before starting the server, and call
+    app.extensions['metrics'].mark_process_dead(pid) from gunicorn's
+    child_exit hook so a dead worker's in-flight gauge does not linger (its
+    counters are kept).
+
+    init_app registers a Metrics of the app's own, in app.extensions['metrics'].
+    """
+
+    def __init__(self, directory=None):
+        self.requests = Counter(
+            'fyyur_http_requests_total', 'HTTP requests handled.', ('endpoint', 'method', 'status'))
+        self.latency = Histogram(
+            'fyyur_http_request_duration_seconds', 'Time to handle a request, including a streamed body.',
+            ('endpoint', 'method'))
+        self.render = Histogram(
+            'fyyur_template_render_seconds', 'Time spent rendering templates per request.', ('endpoint',))
+        self.in_flight = Gauge(
+            'fyyur_http_requests_in_flight', 'Requests currently being handled.', ('endpoint',))
+        self.all = (self.requests, self.latency, self.render, self.in_flight)
+        self.directory = directory
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            counters, gauges = FileValues(directory, 'counter'), FileValues(directory, 'gauge')
+        else:
+            counters = gauges = ProcessValues()
+        for metric in self.all:
+            metric.store = gauges if isinstance(metric, Gauge) else counters
+
+    def init_app(self, app):
+        instance = app.extensions['metrics'] = Metrics(app.config.get('METRICS_DIR'))
+        app.jinja_env.template_class = TimedTemplate
+        app.before_request(instance.start_request)
+        app.after_request(instance.record_status)
+        app.teardown_request(instance.finish_request)
+        app.register_blueprint(blueprint)
+
+    # per-request state lives in one list on g, since every context-local
+    # lookup costs about as much as a metric increment
+    def start_request(self):
+        endpoint = request.endpoint or 'none'
+        g.metrics = [time.perf_counter(), endpoint, request.method, 500]
+        self.in_flight.inc((endpoint,))
+
+    def record_status(self, response):
+        state = g.get('metrics')
+        if state is not None:
+            state[3] = response.status_code
+        return response
+
+    def finish_request(self, error=None):
+        state = g.pop('metrics', None)
+        if state is None:
+            return
+        start, endpoint, method, status = state
+        self.latency.observe((endpoint, method), time.perf_counter() - start)
+        self.requests.inc((endpoint, method, status))
+        self.in_flight.dec((endpoint,))
+        seconds = render_time()
+        if seconds:
+            self.render.observe((endpoint,), seconds)
+
+    def mark_process_dead(self, pid):
+        if self.directory:
+            path = os.path.join(self.directory, 'gauge_{}.db'.format(pid))
+            if os.path.exists(path):
+                os.remove(path)
+
+    def samples(self):
+        stores = {id(metric.store): metric.store for metric in self.all}
+        return [sample for store in stores.values() for sample in store.items()]
+
+
+metrics = Metrics()
+
+blueprint = Blueprint('metrics', __name__)
+blueprint.before_request(local_only)
+
+
+@blueprint.route('/metrics')
+def metrics_endpoint():
+    app_metrics = current_app.extensions['metrics']
+    return Response(exposition(app_metrics.all, app_metrics.samples()), mimetype='text/plain; version=0.0.4')
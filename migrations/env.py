@@ -73,11 +73,17 @@ def run_migrations_online():
 
     connectable = current_app.extensions['migrate'].db.get_engine()
 
+    # the pg_trgm indexes only exist on PostgreSQL (see 9d1c3e7a5b20)
+    def include_object(object, name, type_, reflected, compare_to):
+        return not (type_ == 'index' and name.endswith('_trgm') and
+                    connectable.dialect.name != 'postgresql')
+
     with connectable.connect() as connection:
         context.configure(
             connection=connection,
             target_metadata=target_metadata,
             process_revision_directives=process_revision_directives,
+            include_object=include_object,
             **current_app.extensions['migrate'].configure_args
         )
 
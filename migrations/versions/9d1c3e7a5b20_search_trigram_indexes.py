@@ -0,0 +1,42 @@
+"""trigram search indexes
+
+Revision ID: 9d1c3e7a5b20
+Revises: 4f81b178f11a
+Create Date: 2026-10-18 10:12:41.203511
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d1c3e7a5b20'
+down_revision = '4f81b178f11a'
+branch_labels = None
+depends_on = None
+
+SEARCHED_COLUMNS = {
+    'Venue': ['name', 'city', 'genres'],
+    'Artist': ['name', 'city', 'genres'],
+}
+
+
+def upgrade():
+    # pg_trgm GIN indexes let ILIKE '%term%' avoid a sequential scan; other
+    # databases fall back to the in-process index in search.py
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table, columns in SEARCHED_COLUMNS.items():
+        for column in columns:
+            op.create_index(
+                'ix_{}_{}_trgm'.format(table.lower(), column), table, [column],
+                postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'})
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for table, columns in SEARCHED_COLUMNS.items():
+        for column in columns:
+            op.drop_index('ix_{}_{}_trgm'.format(table.lower(), column), table_name=table)
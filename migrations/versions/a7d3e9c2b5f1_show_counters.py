@@ -0,0 +1,52 @@
+"""show counters on Venue and Artist
+
+Revision ID: a7d3e9c2b5f1
+Revises: f8a4c6e1d3b9
+Create Date: 2026-10-18 19:32:08.415027
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d3e9c2b5f1'
+down_revision = 'f8a4c6e1d3b9'
+branch_labels = None
+depends_on = None
+
+OWNERS = (('Venue', 'venue_id'), ('Artist', 'artist_id'))
+
+
+def upgrade():
+    show = sa.table('Show', sa.column('id', sa.Integer), sa.column('venue_id', sa.Integer),
+                    sa.column('artist_id', sa.Integer), sa.column('start_time', sa.DateTime))
+    now = datetime.utcnow()
+    for table, fk in OWNERS:
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), nullable=False, server_default='0'))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), nullable=False, server_default='0'))
+        op.add_column(table, sa.Column('next_show_at', sa.DateTime(), nullable=True))
+        op.create_index(op.f('ix_{}_next_show_at'.format(table)), table, ['next_show_at'])
+
+        # backfill from the existing shows
+        owner = sa.table(table, sa.column('id', sa.Integer), sa.column('upcoming_shows_count', sa.Integer),
+                         sa.column('past_shows_count', sa.Integer), sa.column('next_show_at', sa.DateTime))
+        own_shows = show.c[fk] == owner.c.id
+        op.execute(owner.update().values(
+            upcoming_shows_count=sa.select([sa.func.count(show.c.id)])
+                .where(own_shows).where(show.c.start_time > now).label('upcoming_shows_count'),
+            past_shows_count=sa.select([sa.func.count(show.c.id)])
+                .where(own_shows).where(show.c.start_time <= now).label('past_shows_count'),
+            next_show_at=sa.select([sa.func.min(show.c.start_time)])
+                .where(own_shows).where(show.c.start_time > now).label('next_show_at')))
+
+
+def downgrade():
+    for table, _ in OWNERS:
+        op.drop_index(op.f('ix_{}_next_show_at'.format(table)), table_name=table)
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('next_show_at')
+            batch_op.drop_column('past_shows_count')
+            batch_op.drop_column('upcoming_shows_count')
@@ -0,0 +1,59 @@
+"""upcoming_shows materialized view
+
+Revision ID: a9c4e2f7d1b3
+Revises: a7d3e9c2b5f1
+Create Date: 2026-10-18 20:02:47.193860
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9c4e2f7d1b3'
+down_revision = 'a7d3e9c2b5f1'
+branch_labels = None
+depends_on = None
+
+COLUMNS = '''
+    "Show".id AS show_id, "Show".start_time,
+    "Show".venue_id, "Venue".name AS venue_name, "Venue".image_link AS venue_image_link,
+    "Show".artist_id, "Artist".name AS artist_name, "Artist".image_link AS artist_image_link
+  FROM "Show"
+  JOIN "Venue" ON "Venue".id = "Show".venue_id
+  JOIN "Artist" ON "Artist".id = "Show".artist_id
+'''
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        # start_time holds naive UTC timestamps
+        op.execute('CREATE MATERIALIZED VIEW upcoming_shows AS SELECT' + COLUMNS +
+                   "WHERE \"Show\".start_time > (now() AT TIME ZONE 'utc')")
+        # REFRESH ... CONCURRENTLY needs a unique index
+        op.execute('CREATE UNIQUE INDEX ux_upcoming_shows_show_id ON upcoming_shows (show_id)')
+        op.execute('CREATE INDEX ix_upcoming_shows_start_time ON upcoming_shows (start_time)')
+    else:
+        op.create_table('upcoming_shows',
+            sa.Column('show_id', sa.Integer(), primary_key=True),
+            sa.Column('start_time', sa.DateTime(), nullable=False),
+            sa.Column('venue_id', sa.Integer(), nullable=False),
+            sa.Column('venue_name', sa.String()),
+            sa.Column('venue_image_link', sa.String(length=500)),
+            sa.Column('artist_id', sa.Integer(), nullable=False),
+            sa.Column('artist_name', sa.String()),
+            sa.Column('artist_image_link', sa.String(length=500)),
+        )
+        op.create_index(op.f('ix_upcoming_shows_start_time'), 'upcoming_shows', ['start_time'])
+        op.get_bind().execute(sa.text('INSERT INTO upcoming_shows SELECT' + COLUMNS +
+                                      'WHERE "Show".start_time > :now'), now=datetime.utcnow())
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('DROP MATERIALIZED VIEW upcoming_shows')
+    else:
+        op.drop_index(op.f('ix_upcoming_shows_start_time'), table_name='upcoming_shows')
+        op.drop_table('upcoming_shows')
@@ -0,0 +1,30 @@
+"""show and venue indexes
+
+Revision ID: c3a8f41e92d7
+Revises: 9d1c3e7a5b20
+Create Date: 2026-10-18 11:02:17.558930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3a8f41e92d7'
+down_revision = '9d1c3e7a5b20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_show_venue_id_start_time', 'Show', ['venue_id', 'start_time'])
+    op.create_index('ix_show_artist_id_start_time', 'Show', ['artist_id', 'start_time'])
+    op.create_index('ix_show_start_time_id', 'Show', ['start_time', 'id'])
+    op.create_index('ix_venue_city_state', 'Venue', ['city', 'state'])
+
+
+def downgrade():
+    op.drop_index('ix_venue_city_state', table_name='Venue')
+    op.drop_index('ix_show_start_time_id', table_name='Show')
+    op.drop_index('ix_show_artist_id_start_time', table_name='Show')
+    op.drop_index('ix_show_venue_id_start_time', table_name='Show')
@@ -0,0 +1,97 @@
+"""normalized genres
+
+Revision ID: e5b7d2a9c614
+Revises: c3a8f41e92d7
+Create Date: 2026-10-18 12:20:05.113702
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b7d2a9c614'
+down_revision = 'c3a8f41e92d7'
+branch_labels = None
+depends_on = None
+
+OWNERS = (('Venue', 'venue_genres', 'venue_id'), ('Artist', 'artist_genres', 'artist_id'))
+
+
+def split_genres(value):
+    # rows were written both as "Jazz,Rock" and, from list form data, as "{Jazz,Rock}"
+    value = (value or '').strip().strip('{}')
+    return [name.strip().strip('"') for name in value.split(',') if name.strip().strip('"')]
+
+
+def upgrade():
+    genre = op.create_table('Genre',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=120), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name')
+    )
+    for table, association, owner_id in OWNERS:
+        op.create_table(association,
+            sa.Column('genre_id', sa.Integer(), nullable=False),
+            sa.Column(owner_id, sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['genre_id'], ['Genre.id'], ondelete='CASCADE'),
+            sa.ForeignKeyConstraint([owner_id], [table + '.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('genre_id', owner_id)
+        )
+        op.create_index(op.f('ix_{}_{}'.format(association, owner_id)), association, [owner_id])
+
+    # move the comma-joined strings into the association tables
+    bind = op.get_bind()
+    genre_ids = {}
+    for table, association, owner_id in OWNERS:
+        links = []
+        for id, genres in bind.execute(sa.text('SELECT id, genres FROM "{}"'.format(table))):
+            for name in split_genres(genres):
+                if name not in genre_ids:
+                    genre_ids[name] = bind.execute(genre.insert().values(name=name)).inserted_primary_key[0]
+                links.append({'genre_id': genre_ids[name], owner_id: id})
+        if links:
+            op.bulk_insert(sa.table(association, sa.column('genre_id'), sa.column(owner_id)), links)
+
+    if bind.dialect.name == 'postgresql':
+        op.drop_index('ix_venue_genres_trgm', table_name='Venue')
+        op.drop_index('ix_artist_genres_trgm', table_name='Artist')
+        # search matches genres by ILIKE '%term%' on Genre.name
+        op.create_index('ix_genre_name_trgm', 'Genre', ['name'],
+                        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+    for table, association, owner_id in OWNERS:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('genres')
+
+
+def downgrade():
+    op.add_column('Venue', sa.Column('genres', sa.String(length=120), nullable=True))
+    op.add_column('Artist', sa.Column('genres', sa.String(length=120), nullable=True))
+
+    bind = op.get_bind()
+    for table, association, owner_id in OWNERS:
+        genres = {}
+        rows = bind.execute(sa.text(
+            'SELECT a.{0}, g.name FROM {1} a JOIN "Genre" g ON g.id = a.genre_id ORDER BY g.name'
+            .format(owner_id, association)))
+        for id, name in rows:
+            genres.setdefault(id, []).append(name)
+        for id, names in genres.items():
+            bind.execute(sa.text('UPDATE "{}" SET genres = :genres WHERE id = :id'.format(table)),
+                         {'genres': ','.join(names), 'id': id})
+
+    bind.execute(sa.text('''UPDATE "Venue" SET genres = '' WHERE genres IS NULL'''))
+    with op.batch_alter_table('Venue') as batch_op:
+        batch_op.alter_column('genres', existing_type=sa.String(length=120), nullable=False)
+    if bind.dialect.name == 'postgresql':
+        op.drop_index('ix_genre_name_trgm', table_name='Genre')
+        op.create_index('ix_venue_genres_trgm', 'Venue', ['genres'],
+                        postgresql_using='gin', postgresql_ops={'genres': 'gin_trgm_ops'})
+        op.create_index('ix_artist_genres_trgm', 'Artist', ['genres'],
+                        postgresql_using='gin', postgresql_ops={'genres': 'gin_trgm_ops'})
+
+    for table, association, owner_id in OWNERS:
+        op.drop_index(op.f('ix_{}_{}'.format(association, owner_id)), table_name=association)
+        op.drop_table(association)
+    op.drop_table('Genre')
@@ -0,0 +1,39 @@
+"""updated_at columns
+
+Revision ID: f8a4c6e1d3b9
+Revises: e5b7d2a9c614
+Create Date: 2026-10-18 13:41:52.870214
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f8a4c6e1d3b9'
+down_revision = 'e5b7d2a9c614'
+branch_labels = None
+depends_on = None
+
+TABLES = ('Venue', 'Artist', 'Show')
+
+
+def upgrade():
+    # naive UTC, as the app writes it; CURRENT_TIMESTAMP would be the server's local time
+    now = datetime.utcnow()
+    for table in TABLES:
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=True))
+        op.execute(sa.table(table, sa.column('updated_at', sa.DateTime()))
+                   .update().values(updated_at=now))
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column('updated_at', existing_type=sa.DateTime(), nullable=False)
+        op.create_index(op.f('ix_{}_updated_at'.format(table)), table, ['updated_at'])
+
+
+def downgrade():
+    for table in TABLES:
+        op.drop_index(op.f('ix_{}_updated_at'.format(table)), table_name=table)
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('updated_at')
@@ -1,70 +1,200 @@
-from email.policy import default
-from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
-
-#----------------------------------------------------------------------------#
-# App Config.
-#----------------------------------------------------------------------------#
-
-app = Flask(__name__)
-db = SQLAlchemy()
-migrate = Migrate(app, db)
-
-#----------------------------------------------------------------------------#
-# Models.
-#----------------------------------------------------------------------------#
-
-class Venue(db.Model):
-    __tablename__ = 'Venue'
-
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
-    city = db.Column(db.String(120))
-    state = db.Column(db.String(120))
-    address = db.Column(db.String(120))
-    phone = db.Column(db.String(120))
-    image_link = db.Column(db.String(500))
-    facebook_link = db.Column(db.String(120))
-# TODO: implement any missing fields, as a database migration using Flask-Migrate
-    genres = db.Column(db.String(120),nullable=False)
-    website_link = db.Column(db.String(120))
-    seeking_talent = db.Column(db.Boolean,default=False)
-    seeking_description = db.Column(db.Text)
-    shows = db.relationship('Show',backref='venue',lazy=True,cascade="save-update, merge, delete")
-
-    def __repr__(self):
-        return f"<Venue id={self.id} name={self.name} city={self.city} state={self.city} phone={self.phone} genres={self.genres}>\n"
-
-class Artist(db.Model):
-    __tablename__ = 'Artist'
-
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
-    city = db.Column(db.String(120))
-    state = db.Column(db.String(120))
-    phone = db.Column(db.String(120))
-    genres = db.Column(db.String(120))
-    image_link = db.Column(db.String(500))
-    facebook_link = db.Column(db.String(120))
- # TODO: implement any missing fields, as a database migration using Flask-Migrate
-    website_link = db.Column(db.String(120))
-    seeking_venue = db.Column(db.Boolean,default=False)
-    seeking_description = db.Column(db.Text)
-    shows = db.relationship('Show',backref='artist',lazy=True,cascade="save-update, merge, delete")
-
-    def __repr__(self):
-        return f"<Artist id={self.id} name={self.name} city={self.city} state={self.city} phone={self.phone} genres={self.genres}>\n"
-
-
-  # TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
-class Show(db.Model):
-    __tablename__ = "Show"
-
-    id = db.Column(db.Integer, primary_key=True)
-    artist_id = db.Column(db.Integer, db.ForeignKey("Artist.id"), nullable=False)
-    venue_id = db.Column(db.Integer, db.ForeignKey("Venue.id"), nullable=False)
-    start_time = db.Column(db.DateTime, nullable=False)
-
-    def __repr__(self):
-        return f"<Show id={self.id} artist_id={self.artist_id} venue_id={self.venue_id} start_time={self.start_time}"
+from datetime import datetime
+from sqlalchemy import DDL, event
+from routing import RoutingSQLAlchemy
+
+#----------------------------------------------------------------------------#
+# Database. Bound to an app by create_app (app.py).
+#----------------------------------------------------------------------------#
+
+db = RoutingSQLAlchemy()
+
+#----------------------------------------------------------------------------#
+# Models.
+#----------------------------------------------------------------------------#
+
+def trigram_index(table, column):
+    # the pg_trgm GIN index search's ILIKE '%term%' uses on PostgreSQL, as
+    # the 9d1c3e7a5b20 and e5b7d2a9c614 migrations create it; elsewhere it is
+    # a plain index search.py does not rely on
+    return db.Index('ix_{}_{}_trgm'.format(table, column), column,
+                    postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'})
+
+
+event.listen(db.Model.metadata, 'before_create',
+             DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql'))
+
+# Genre association tables. The primary keys lead with genre_id so "all
+# venues/artists of a genre" is an index range scan.
+venue_genres = db.Table('venue_genres',
+    db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('venue_id', db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'), primary_key=True, index=True),
+)
+
+artist_genres = db.Table('artist_genres',
+    db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('artist_id', db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'), primary_key=True, index=True),
+)
+
+class Genre(db.Model):
+    __tablename__ = 'Genre'
+    __table_args__ = (
+        trigram_index('genre', 'name'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False, unique=True)
+
+    @classmethod
+    def get_or_create_all(cls, names):
+        # resolves genre names to Genre rows with one query, adding any new ones
+        names = sorted({name.strip() for name in names if name and name.strip()})
+        existing = {genre.name: genre for genre in cls.query.filter(cls.name.in_(names))} if names else {}
+        for name in names:
+            if name not in existing:
+                existing[name] = cls(name=name)
+                db.session.add(existing[name])
+        return [existing[name] for name in names]
+
+    def __repr__(self):
+        return f"<Genre id={self.id} name={self.name}>"
+
+
+class Venue(db.Model):
+    __tablename__ = 'Venue'
+    __table_args__ = (
+        # /venues groups by area; the homepage's ORDER BY id DESC uses the primary key
+        db.Index('ix_venue_city_state', 'city', 'state'),
+        trigram_index('venue', 'name'),
+        trigram_index('venue', 'city'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String)
+    city = db.Column(db.String(120))
+    state = db.Column(db.String(120))
+    address = db.Column(db.String(120))
+    phone = db.Column(db.String(120))
+    image_link = db.Column(db.String(500))
+    facebook_link = db.Column(db.String(120))
+# TODO: implement any missing fields, as a database migration using Flask-Migrate
+    genres = db.relationship('Genre', secondary=venue_genres, order_by='Genre.name')
+    website_link = db.Column(db.String(120))
+    seeking_talent = db.Column(db.Boolean,default=False)
+    seeking_description = db.Column(db.Text)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    # show counters, maintained from Show by refresh_show_counters()
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    next_show_at = db.Column(db.DateTime, index=True)
+    shows = db.relationship('Show',backref='venue',lazy=True,cascade="save-update, merge, delete")
+
+    @property
+    def genre_names(self):
+        return [genre.name for genre in self.genres]
+
+    def __repr__(self):
+        return f"<Venue id={self.id} name={self.name} city={self.city} state={self.city} phone={self.phone} genres={self.genre_names}>\n"
+
+class Artist(db.Model):
+    __tablename__ = 'Artist'
+    __table_args__ = (
+        trigram_index('artist', 'name'),
+        trigram_index('artist', 'city'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String)
+    city = db.Column(db.String(120))
+    state = db.Column(db.String(120))
+    phone = db.Column(db.String(120))
+    genres = db.relationship('Genre', secondary=artist_genres, order_by='Genre.name')
+    image_link = db.Column(db.String(500))
+    facebook_link = db.Column(db.String(120))
+ # TODO: implement any missing fields, as a database migration using Flask-Migrate
+    website_link = db.Column(db.String(120))
+    seeking_venue = db.Column(db.Boolean,default=False)
+    seeking_description = db.Column(db.Text)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    # show counters, maintained from Show by refresh_show_counters()
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    next_show_at = db.Column(db.DateTime, index=True)
+    shows = db.relationship('Show',backref='artist',lazy=True,cascade="save-update, merge, delete")
+
+    @property
+    def genre_names(self):
+        return [genre.name for genre in self.genres]
+
+    def __repr__(self):
+        return f"<Artist id={self.id} name={self.name} city={self.city} state={self.city} phone={self.phone} genres={self.genre_names}>\n"
+
+
+  # TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
+class Show(db.Model):
+    __tablename__ = "Show"
+    __table_args__ = (
+        # shows are always looked up by venue or artist together with a
+        # start_time comparison, and /shows pages on (start_time, id)
+        db.Index('ix_show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_show_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_show_start_time_id', 'start_time', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    artist_id = db.Column(db.Integer, db.ForeignKey("Artist.id"), nullable=False)
+    venue_id = db.Column(db.Integer, db.ForeignKey("Venue.id"), nullable=False)
+    start_time = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f"<Show id={self.id} artist_id={self.artist_id} venue_id={self.venue_id} start_time={self.start_time}"
+
+
+@event.listens_for(db.session, 'before_flush')
+def touch_updated_at(session, flush_context, instances):
+    # onupdate only fires for column changes; genre edits only touch the
+    # association tables, so stamp every modified row here as well
+    now = datetime.utcnow()
+    for instance in session.dirty:
+        if isinstance(instance, (Venue, Artist, Show)) and session.is_modified(instance):
+            instance.updated_at = now
+
+
+#----------------------------------------------------------------------------#
+# Show counters.
+#----------------------------------------------------------------------------#
+
+def show_counter_update(model, now):
+    """UPDATE recomputing model's show counters from Show as of now."""
+    fk = Show.venue_id if model is Venue else Show.artist_id
+    upcoming = db.select([db.func.count(Show.id)]).where(fk == model.id).where(Show.start_time > now)
+    past = db.select([db.func.count(Show.id)]).where(fk == model.id).where(Show.start_time <= now)
+    next_show = db.select([db.func.min(Show.start_time)]).where(fk == model.id).where(Show.start_time > now)
+    return model.__table__.update().values(
+        upcoming_shows_count=upcoming.label('upcoming_shows_count'),
+        past_shows_count=past.label('past_shows_count'),
+        next_show_at=next_show.label('next_show_at'))
+
+
+def refresh_show_counters(bind, venue_ids=(), artist_ids=(), now=None, chunk_size=500):
+    # recomputes the counters of just these venues and artists, in the
+    # caller's transaction, so they change together with their shows
+    now = now or datetime.utcnow()
+    for model, ids in ((Venue, venue_ids), (Artist, artist_ids)):
+        ids = sorted({int(id) for id in ids if id is not None})
+        for start in range(0, len(ids), chunk_size):
+            bind.execute(show_counter_update(model, now).where(model.id.in_(ids[start:start + chunk_size])))
+
+
+@event.listens_for(db.session, 'after_flush')
+def refresh_flushed_show_counters(session, flush_context):
+    # shows added, moved or deleted through the ORM, including those deleted
+    # by the venue and artist cascades
+    venue_ids, artist_ids = set(), set()
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(instance, Show):
+            state = db.inspect(instance)
+            venue_ids.update([instance.venue_id] + list(state.attrs.venue_id.history.deleted))
+            artist_ids.update([instance.artist_id] + list(state.attrs.artist_id.history.deleted))
+    if venue_ids or artist_ids:
+        refresh_show_counters(session.connection(), venue_ids, artist_ids)
@@ -0,0 +1,203 @@
+import os
+import threading
+import time
+
+from flask import Blueprint, abort, current_app, jsonify, request
+from sqlalchemy import event, exc
+from sqlalchemy.pool import NullPool, QueuePool
+
+from model import db
+
+#----------------------------------------------------------------------------#
+# Metrics.
+#----------------------------------------------------------------------------#
+
+# upper bounds, in seconds, of the checkout wait histogram buckets
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, float('inf'))
+
+
+class PoolMetrics:
+    """Counters for one engine's connection pool in this process."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.checkouts = 0
+            self.checkins = 0
+            self.connects = 0
+            self.invalidations = 0
+            self.timeouts = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+            self.wait_buckets = [0] * len(WAIT_BUCKETS)
+
+    def counter(self, attribute):
+        # a pool event listener adding one to attribute
+        def listener(*args):
+            with self.lock:
+                setattr(self, attribute, getattr(self, attribute) + 1)
+        return listener
+
+    def record_wait(self, seconds):
+        with self.lock:
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            for i, bound in enumerate(WAIT_BUCKETS):
+                if seconds <= bound:
+                    self.wait_buckets[i] += 1
+                    break
+
+    def snapshot(self, pool):
+        with self.lock:
+            data = {
+                'pool': type(pool).__name__,
+                'checkouts': self.checkouts,
+                'checkins': self.checkins,
+                'connects': self.connects,
+                'invalidations': self.invalidations,
+                'timeouts': self.timeouts,
+                'wait_seconds_total': self.wait_total,
+                'wait_seconds_max': self.wait_max,
+                'wait_seconds_buckets': {
+                    ('+Inf' if bound == float('inf') else str(bound)): count
+                    for bound, count in zip(WAIT_BUCKETS, self.wait_buckets)},
+            }
+        if isinstance(pool, QueuePool):
+            data.update({
+                'size': pool.size(),
+                'checked_in': pool.checkedin(),
+                'checked_out': pool.checkedout(),
+                'overflow': pool.overflow(),
+                'max_overflow': pool._max_overflow,
+                'timeout': pool.timeout(),
+            })
+        return data
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection.
+
+    Waits go to the PoolMetrics the pool was given by PoolMonitor, if any.
+    """
+
+    metrics = None
+
+    def recreate(self):
+        # engine.dispose() swaps in a new pool, which keeps the metrics
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def _do_get(self):
+        if self.metrics is None:
+            return super()._do_get()
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            with self.metrics.lock:
+                self.metrics.timeouts += 1
+            raise
+        finally:
+            self.metrics.record_wait(time.perf_counter() - start)
+
+
+class PoolMonitor:
+    """Pool metrics for each of an app's engines, the primary and every replica.
+
+    init_app keeps one PoolMetrics per bind (None for the primary) in
+    app.extensions['pool_metrics'] and creates the engines to count their
+    pools' events; /internal/pool reports each pool separately.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        registry = app.extensions['pool_metrics'] = {}
+        for bind in [None] + list(app.config.get('SQLALCHEMY_BINDS') or ()):
+            registry[bind] = self.watch(db.get_engine(app, bind=bind))
+        return registry
+
+    def watch(self, engine):
+        # listeners on the engine carry over to pools engine.dispose() recreates
+        metrics = PoolMetrics()
+        for name, attribute in (('checkout', 'checkouts'), ('checkin', 'checkins'),
+                                ('connect', 'connects'), ('invalidate', 'invalidations')):
+            event.listen(engine, name, metrics.counter(attribute))
+        if isinstance(engine.pool, InstrumentedQueuePool):
+            engine.pool.metrics = metrics
+        return metrics
+
+    def snapshot(self):
+        return {
+            'pid': os.getpid(),
+            'pools': {bind or 'primary': metrics.snapshot(db.get_engine(bind=bind).pool)
+                      for bind, metrics in current_app.extensions['pool_metrics'].items()},
+        }
+
+
+pool_monitor = PoolMonitor()
+
+#----------------------------------------------------------------------------#
+# Configuration.
+#----------------------------------------------------------------------------#
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS built from the DB_POOL_* settings.
+
+    With DB_PGBOUNCER set, connections are opened per checkout (NullPool) and
+    left to PgBouncer to pool. SQLite keeps SQLAlchemy's own defaults.
+    """
+    if config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        return {}
+    if config.get('DB_PGBOUNCER'):
+        return {'poolclass': NullPool, 'pool_pre_ping': config['DB_POOL_PRE_PING']}
+    return {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+    }
+
+
+def async_engine_options(config, uri):
+    """engine_options() for the asyncio engines the JSON API reads with (asyncdb.py).
+
+    Async engines need an asyncio-aware pool, so the checkout wait metrics
+    above only cover the synchronous engines.
+    """
+    if uri.startswith('sqlite'):
+        return {}
+    if config.get('DB_PGBOUNCER'):
+        return {'poolclass': NullPool, 'pool_pre_ping': config['DB_POOL_PRE_PING']}
+    return {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+    }
+
+#----------------------------------------------------------------------------#
+# Internal endpoint.
+#----------------------------------------------------------------------------#
+
+internal = Blueprint('internal', __name__, url_prefix='/internal')
+
+
+@internal.before_request
+def local_only():
+    if request.remote_addr not in current_app.config['INTERNAL_ALLOWED_ADDRS']:
+        abort(404)
+
+
+@internal.route('/pool')
+def pool_stats():
+    return jsonify(pool_monitor.snapshot())
@@ -0,0 +1,73 @@
+import random
+import time
+
+from flask import current_app, g, has_request_context, request, session
+from flask_sqlalchemy import SignallingSession, SQLAlchemy
+from sqlalchemy import event, orm
+from sqlalchemy.sql.expression import UpdateBase
+
+#----------------------------------------------------------------------------#
+# Read replica routing.
+#----------------------------------------------------------------------------#
+
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class RoutingSession(SignallingSession):
+    """Session that sends a read-only request's queries to a replica.
+
+    Flushes and INSERT/UPDATE/DELETE statements always go to the primary.
+    """
+
+    def __init__(self, db, **options):
+        self.db = db
+        super().__init__(db, **options)
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        replica = g.get('db_replica') if has_request_context() else None
+        if replica is not None and not self._flushing and not isinstance(clause, UpdateBase):
+            return self.db.get_engine(self.app, bind=replica)
+        return super().get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    """SQLAlchemy with optional read replicas taken from SQLALCHEMY_REPLICA_URIS.
+
+    GET/HEAD requests read from a randomly picked replica, except for
+    READ_YOUR_WRITES_SECONDS after the same client committed a write, when
+    they stay on the primary so the client sees its own changes. That
+    deadline is kept in the session cookie, so every worker needs the same
+    fixed SECRET_KEY.
+    """
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def init_app(self, app):
+        replicas = app.config.get('SQLALCHEMY_REPLICA_URIS') or ()
+        if replicas and not app.config.get('SECRET_KEY'):
+            raise ValueError('SQLALCHEMY_REPLICA_URIS needs a fixed SECRET_KEY (FYYUR_SECRET_KEY)')
+        binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+        binds.update(('replica_{}'.format(i), uri) for i, uri in enumerate(replicas))
+        app.config['SQLALCHEMY_BINDS'] = binds or None
+        app.extensions['db_replicas'] = ['replica_{}'.format(i) for i in range(len(replicas))]
+        super().init_app(app)
+
+        if replicas:
+            app.before_request(self._choose_bind)
+            app.after_request(self._stick_to_primary)
+            event.listen(self.session, 'after_commit', self._record_write)
+
+    def _choose_bind(self):
+        g.db_replica = None
+        if request.method in READ_METHODS and session.get('db_primary_until', 0) < time.time():
+            g.db_replica = random.choice(current_app.extensions['db_replicas'])
+
+    def _record_write(self, db_session):
+        if has_request_context():
+            g.db_wrote = True
+
+    def _stick_to_primary(self, response):
+        if g.get('db_wrote'):
+            session['db_primary_until'] = time.time() + current_app.config.get('READ_YOUR_WRITES_SECONDS', 5)
+        return response
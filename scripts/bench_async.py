@@ -0,0 +1,179 @@
+"""Throughput and latency of the sync (gunicorn) and async (uvicorn) deployments.
+
+Drives the JSON read API, whose async views run on a background event loop
+under gunicorn and on uvicorn's loop under asgi.py, plus one HTML view, at
+increasing numbers of concurrent clients (one process and one
+keep-alive connection each) against both servers, over HTTP.
+
+    python scripts/bench_async.py --launch --workers 4           # start both servers here
+    python scripts/bench_async.py --sync http://10.0.0.5:8000 --async http://10.0.0.5:8001
+    python scripts/bench_async.py --concurrency 1,16,64 --requests 2000
+
+--launch runs `gunicorn wsgi:app` (WORKERS processes of --threads threads)
+and `uvicorn asgi:application` (WORKERS processes) against the configured
+database, with the page cache off. Results are saved to --output (default
+bench/async-<commit>.json); bench_load.py --compare does not read them.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_load import commit, http_worker, summary, targets as load_targets
+
+
+def targets():
+    """(label, path) for every benchmarked endpoint."""
+    ids = {label: path.rsplit('/', 1)[1] for label, _, path, _ in load_targets() if label.endswith('<id>')}
+    return [
+        ('api venue', '/api/v1/venues/{}'.format(ids['/venues/<id>'])),
+        ('api artist', '/api/v1/artists/{}'.format(ids['/artists/<id>'])),
+        ('api calendar', '/api/v1/calendar/week'),
+        ('html /venues', '/venues'),
+    ]
+
+
+def run(url, concurrency, requests):
+    results = []
+    with multiprocessing.Pool(concurrency) as pool:
+        for label, path in targets():
+            # warm every client's connection and the server's caches
+            pool.map(http_worker, [(url, 'GET', path, None, 1)] * concurrency)
+            shares = [(url, 'GET', path, None, requests // concurrency + (i < requests % concurrency))
+                      for i in range(concurrency)]
+            start = time.perf_counter()
+            latencies = []
+            for worker_latencies, _ in pool.map(http_worker, shares):
+                latencies += worker_latencies
+            result = summary(label, latencies, [], time.perf_counter() - start)
+            del result['queries_per_request']
+            result['concurrency'] = concurrency
+            results.append(result)
+    return results
+
+#----------------------------------------------------------------------------#
+# Servers.
+#----------------------------------------------------------------------------#
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(url, timeout=30):
+    parts = urlsplit(url)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((parts.hostname, parts.port), 1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise SystemExit('{} did not start'.format(url))
+
+
+def launch(workers, threads):
+    """Starts gunicorn and uvicorn; returns ({mode: url}, processes)."""
+    env = dict(os.environ, FYYUR_CACHE_TYPE='null', FYYUR_ASGI_WSGI_THREADS=str(threads))
+    ports = {'sync': free_port(), 'async': free_port()}
+    commands = {
+        'sync': ['gunicorn', 'wsgi:app', '--workers', str(workers), '--threads', str(threads),
+                 '--bind', '127.0.0.1:{}'.format(ports['sync']), '--log-level', 'warning'],
+        'async': ['uvicorn', 'asgi:application', '--workers', str(workers),
+                  '--port', str(ports['async']), '--log-level', 'warning', '--no-access-log'],
+    }
+    processes = [subprocess.Popen([sys.executable, '-m'] + command, cwd=ROOT, env=env)
+                 for command in commands.values()]
+    urls = {mode: 'http://127.0.0.1:{}'.format(port) for mode, port in ports.items()}
+    for url in urls.values():
+        wait_for(url)
+    return urls, processes
+
+#----------------------------------------------------------------------------#
+# Reporting.
+#----------------------------------------------------------------------------#
+
+def print_results(results):
+    print('{:<6} {:>5} {:<14} {:>9} {:>9} {:>9} {:>10}'.format(
+        'mode', 'conc', 'view', 'p50 ms', 'p95 ms', 'p99 ms', 'req/s'))
+    for result in results:
+        print('{:<6} {:>5} {:<14} {:>9.2f} {:>9.2f} {:>9.2f} {:>10.1f}'.format(
+            result['mode'], result['concurrency'], result['view'],
+            result['p50_ms'], result['p95_ms'], result['p99_ms'], result['throughput_rps']))
+
+
+def print_speedup(results):
+    # async over sync, per view and concurrency
+    sync = {(result['view'], result['concurrency']): result for result in results if result['mode'] == 'sync'}
+    print('{:>5} {:<14} {:>10} {:>10}'.format('conc', 'view', 'p99', 'req/s'))
+    for result in results:
+        before = sync.get((result['view'], result['concurrency']))
+        if result['mode'] == 'async' and before:
+            print('{:>5} {:<14} {:>9.2f}x {:>9.2f}x'.format(
+                result['concurrency'], result['view'],
+                before['p99_ms'] / result['p99_ms'], result['throughput_rps'] / before['throughput_rps']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sync', help='URL of a running gunicorn deployment.')
+    parser.add_argument('--async', dest='async_', metavar='ASYNC', help='URL of a running uvicorn deployment.')
+    parser.add_argument('--launch', action='store_true', help='Start both servers for the run.')
+    parser.add_argument('--workers', type=int, default=2, help='Server worker processes with --launch.')
+    parser.add_argument('--threads', type=int, default=4,
+                        help='gunicorn threads, and ASGI_WSGI_THREADS, per worker with --launch.')
+    parser.add_argument('--concurrency', default='1,8,32', help='Comma separated client counts.')
+    parser.add_argument('--requests', type=int, default=500, help='Requests per view and concurrency.')
+    parser.add_argument('--output', help='Where to save the results (default bench/async-<commit>.json).')
+    args = parser.parse_args()
+
+    processes = []
+    if args.launch:
+        urls, processes = launch(args.workers, args.threads)
+    else:
+        urls = {mode: url for mode, url in (('sync', args.sync), ('async', args.async_)) if url}
+    if not urls:
+        parser.error('pass --launch, or --sync and/or --async URLs')
+
+    results = []
+    try:
+        for concurrency in [int(value) for value in args.concurrency.split(',')]:
+            for mode, url in urls.items():
+                run_results = run(url, concurrency, args.requests)
+                for result in run_results:
+                    result['mode'] = mode
+                print_results(run_results)
+                results += run_results
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+    print()
+    print_speedup(results)
+
+    output = args.output or os.path.join('bench', 'async-{}.json'.format(commit()))
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as file:
+        json.dump({
+            'commit': commit(),
+            'date': datetime.utcnow().isoformat(),
+            'urls': urls,
+            'workers': args.workers if args.launch else None,
+            'threads': args.threads if args.launch else None,
+            'results': results,
+        }, file, indent=2)
+    print('saved', output)
+
+
+if __name__ == '__main__':
+    main()
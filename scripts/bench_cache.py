@@ -0,0 +1,52 @@
+"""Requests/sec of the cached read views with the page cache on and off.
+
+Runs against the configured, already seeded database through the Flask
+test client:
+
+    python scripts/bench_cache.py            # 200 requests per view
+    python scripts/bench_cache.py 1000
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wsgi import app
+from cache import NullCache, SimpleCache
+from model import db, Venue, Artist
+
+
+def views():
+    with app.app_context():
+        venue_id = db.session.query(db.func.min(Venue.id)).scalar()
+        artist_id = db.session.query(db.func.min(Artist.id)).scalar()
+    urls = ['/', '/venues', '/artists', '/shows']
+    if venue_id is not None:
+        urls.append('/venues/{}'.format(venue_id))
+    if artist_id is not None:
+        urls.append('/artists/{}'.format(artist_id))
+    return urls
+
+
+def requests_per_second(client, url, requests):
+    client.get(url)
+    start = time.perf_counter()
+    for _ in range(requests):
+        client.get(url)
+    return requests / (time.perf_counter() - start)
+
+
+def main(requests):
+    client = app.test_client()
+    print('{:<20} {:>12} {:>12} {:>8}'.format('view', 'off req/s', 'on req/s', 'speedup'))
+    for url in views():
+        app.extensions['page_cache'].backend = NullCache()
+        off = requests_per_second(client, url, requests)
+        app.extensions['page_cache'].backend = SimpleCache(app.config['CACHE_THRESHOLD'])
+        on = requests_per_second(client, url, requests)
+        print('{:<20} {:>12.1f} {:>12.1f} {:>7.1f}x'.format(url, off, on, on / off))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,86 @@
+"""Cost of the `datetime` template filter, before and after dates.py.
+
+Formats a /shows page worth of distinct show times with the previous filter
+(dateutil parsing a str() of the value, then Babel parsing the pattern) and
+with date_formatter, cold (every value new to its LRU) and warm (a cached
+page's worth of repeats), then renders the /shows tiles with each. Needs
+no database.
+
+    python scripts/bench_datetime.py            # 1000 show times
+    python scripts/bench_datetime.py 5000
+"""
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import babel.dates
+import dateutil.parser
+
+from wsgi import app
+from dates import FORMATS, format_value
+
+
+def legacy_format_datetime(data, format='medium'):
+    # the filter as it was in app.py
+    date = dateutil.parser.parse(data)
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format, locale='en')
+
+
+def per_call(function, values, repeat=3):
+    # best of `repeat` passes, in microseconds per value
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for value in values:
+            function(value)
+        best = min(best, time.perf_counter() - start)
+    return best / len(values) * 1e6
+
+
+def main(count):
+    date_formatter = app.extensions['date_formatter']
+    start = datetime(2026, 1, 1, 18, 0)
+    values = [start + timedelta(hours=7 * i, minutes=15 * (i % 4)) for i in range(count)]
+
+    # same output as before, for every app format
+    for format in list(FORMATS) + ["y-MM-dd HH:mm"]:
+        for value in values[:200]:
+            assert date_formatter.format(value, format) == legacy_format_datetime(str(value), format), (value, format)
+
+    def cold(value):
+        date_formatter.cached_format.cache_clear()
+        return date_formatter.format(value, 'full')
+
+    rows = [
+        ('previous filter, str() input', per_call(lambda value: legacy_format_datetime(str(value), 'full'), values), 'µs'),
+        ('compiled pattern, no LRU', per_call(lambda value: format_value(value, 'full', 'en', 'UTC'), values), 'µs'),
+        ('date_formatter, cold', per_call(cold, values), 'µs'),
+        ('date_formatter, warm', per_call(lambda value: date_formatter.format(value, 'full'), values), 'µs'),
+    ]
+
+    template = app.jinja_env.from_string(
+        '{% for show in shows %}<h4>{{ show.start_time|datetime("full") }}</h4>{% endfor %}')
+    shows = {
+        'previous filter': ([{'start_time': str(value)} for value in values], legacy_format_datetime),
+        'date_formatter, warm': ([{'start_time': value} for value in values], date_formatter.format),
+    }
+    for label, (data, function) in shows.items():
+        app.jinja_env.filters['datetime'] = function
+        template.render(shows=data)
+        rows.append(('render {} tiles, {}'.format(count, label),
+                     per_call(lambda _: template.render(shows=data), [None]) / 1000, 'ms'))
+    app.jinja_env.filters['datetime'] = date_formatter.format
+
+    for label, value, unit in rows:
+        print('{:<44} {:>10.2f} {}'.format(label, value, unit))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
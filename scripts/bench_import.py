@@ -0,0 +1,84 @@
+"""Rows/sec of the bulk importer against single-row inserts.
+
+Inserts synthetic venues and shows into the configured database, so point
+SQLALCHEMY_DATABASE_URI at a scratch database first:
+
+    python scripts/bench_import.py            # 2000 venues, 10000 shows
+    python scripts/bench_import.py 500 2000
+"""
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wsgi import app
+from importer import import_rows
+from model import db, Venue, Artist, Show, Genre
+
+GENRES = ['Blues', 'Folk', 'Jazz', 'Pop', 'Rock n Roll', 'Soul']
+
+
+def venue_rows(count):
+    for i in range(count):
+        yield i + 1, {
+            'name': 'Bench Venue {}'.format(i), 'city': 'San Francisco', 'state': 'CA',
+            'address': '{} Main St'.format(i), 'phone': '555-0100',
+            'genres': random.sample(GENRES, 2), 'facebook_link': 'https://facebook.com/venue{}'.format(i),
+        }
+
+
+def show_rows(count, venue_ids, artist_ids):
+    start = datetime.utcnow()
+    for i in range(count):
+        yield i + 1, {
+            'venue_id': random.choice(venue_ids), 'artist_id': random.choice(artist_ids),
+            'start_time': (start + timedelta(hours=i)).strftime('%Y-%m-%d %H:%M:%S'),
+        }
+
+
+def single_row_venues(rows):
+    # the create_venue_submission path: one ORM object and one commit per row
+    for _, row in rows:
+        genres = Genre.get_or_create_all(row.pop('genres'))
+        db.session.add(Venue(genres=genres, **row))
+        db.session.commit()
+
+
+def single_row_shows(rows):
+    for _, row in rows:
+        row['start_time'] = datetime.strptime(row['start_time'], '%Y-%m-%d %H:%M:%S')
+        db.session.add(Show(**row))
+        db.session.commit()
+
+
+def timed(label, count, load):
+    start = time.perf_counter()
+    load()
+    elapsed = time.perf_counter() - start
+    print('{:<28} {:>8} rows {:>8.2f}s {:>10.0f} rows/s'.format(label, count, elapsed, count / elapsed))
+    return count / elapsed
+
+
+def main(venues, shows):
+    with app.app_context():
+        if not db.session.query(Artist.id).first():
+            db.session.add(Artist(name='Bench Artist', city='San Francisco', state='CA', phone='555-0100'))
+            db.session.commit()
+        artist_ids = [id for id, in db.session.query(Artist.id)]
+
+        single = timed('venues, single-row', venues, lambda: single_row_venues(venue_rows(venues)))
+        bulk = timed('venues, import', venues, lambda: import_rows('venues', venue_rows(venues)))
+        print('{:>60.1f}x'.format(bulk / single))
+
+        venue_ids = [id for id, in db.session.query(Venue.id)]
+        single = timed('shows, single-row', shows, lambda: single_row_shows(show_rows(shows, venue_ids, artist_ids)))
+        bulk = timed('shows, import', shows, lambda: import_rows('shows', show_rows(shows, venue_ids, artist_ids)))
+        print('{:>60.1f}x'.format(bulk / single))
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:3]]
+    main(*(args + [2000, 10000][len(args):]))
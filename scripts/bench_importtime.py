@@ -0,0 +1,94 @@
+"""Import cost of the app, from `python -X importtime`.
+
+Imports a module (wsgi by default, as a gunicorn worker does on boot) in
+fresh processes and reports the median time to import it, the process's
+total run time, and the import time spent in each top-level package, so
+a change that pulls in a heavy dependency shows up by name. Needs no
+database.
+
+    python scripts/bench_importtime.py                    # this tree, 10 runs
+    python scripts/bench_importtime.py --module asgi
+    git worktree add /tmp/before HEAD~1
+    python scripts/bench_importtime.py --compare /tmp/before
+
+Trees from before wsgi.py existed built the app in app.py; compare those
+with --module app.
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)')
+
+
+def parse(output, module):
+    """(µs importing module, {top-level package: self µs}) from -X importtime output."""
+    total, packages = None, defaultdict(int)
+    for match in LINE.finditer(output):
+        own, cumulative, indent, name = int(match[1]), int(match[2]), match[3], match[4]
+        packages[name.split('.')[0]] += own
+        if name == module and not indent:
+            total = cumulative
+    if total is None:
+        raise SystemExit('{} was not imported:\n{}'.format(module, output[-2000:]))
+    return total, packages
+
+
+def run(tree, module):
+    # as a server process would: no flask command, no log files
+    env = dict(os.environ, FYYUR_SLOW_QUERY_LOG='', FYYUR_WARMUP_ON_START='0')
+    env.pop('FLASK_RUN_FROM_CLI', None)
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+                             cwd=tree, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if process.returncode:
+        raise SystemExit(process.stderr[-2000:])
+    total, packages = parse(process.stderr, module)
+    return total, elapsed, packages
+
+
+def measure(tree, module, runs):
+    run(tree, module)  # writes the .pyc files
+    results = [run(tree, module) for _ in range(runs)]
+    names = set().union(*(packages for _, _, packages in results))
+    return {
+        'import_ms': statistics.median(total for total, _, _ in results) / 1000,
+        'process_ms': statistics.median(elapsed for _, elapsed, _ in results) * 1000,
+        'packages_ms': {name: statistics.median(packages.get(name, 0) for _, _, packages in results) / 1000
+                        for name in names},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--module', default='wsgi', help='Module to import (default wsgi).')
+    parser.add_argument('--runs', type=int, default=10, help='Fresh processes per tree.')
+    parser.add_argument('--top', type=int, default=15, help='Packages to list.')
+    parser.add_argument('--compare', metavar='TREE', help='Another checkout to measure alongside this one.')
+    args = parser.parse_args()
+
+    trees = [(ROOT, 'this tree')] + ([(os.path.abspath(args.compare), args.compare)] if args.compare else [])
+    results = [measure(tree, args.module, args.runs) for tree, _ in trees]
+
+    row = '{:<24}' + ' {:>16}' * len(trees)
+    print(row.format('', *[label[-16:] for _, label in trees]))
+    print(row.format('import ' + args.module, *['{:.1f} ms'.format(result['import_ms']) for result in results]))
+    print(row.format('process', *['{:.1f} ms'.format(result['process_ms']) for result in results]))
+    print()
+    names = sorted(set().union(*(result['packages_ms'] for result in results)),
+                   key=lambda name: -max(result['packages_ms'].get(name, 0) for result in results))
+    for name in names[:args.top]:
+        print(row.format(name, *['{:.1f} ms'.format(result['packages_ms'][name]) if name in result['packages_ms']
+                                 else '-' for result in results]))
+
+
+if __name__ == '__main__':
+    main()
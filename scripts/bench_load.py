@@ -0,0 +1,239 @@
+"""Latency percentiles, queries per request and throughput of the hot read paths.
+
+By default drives the views in-process through the Flask test client, with
+the page cache off, against the configured database as it is. --scales
+reseeds the database (scripts/seed_data.py, --reset) at each scale, where a
+scale of N means N venues, 2N artists and 20N shows; it needs
+FYYUR_DATABASE_URI set to a scratch database. --url instead drives a
+running server over HTTP from several worker processes.
+
+Queries per request are counted on the engines in-process. Over HTTP they
+come from the Server-Timing header, which is sent before a streamed page's
+body and so misses the queries run while it streams (/venues, /shows): those
+views' counts are low in HTTP mode.
+
+    python scripts/bench_load.py                                  # current data
+    FYYUR_DATABASE_URI=postgresql:///fyyur_bench python scripts/bench_load.py --scales 100,1000,10000
+    python scripts/bench_load.py --url http://127.0.0.1:5000 --workers 8 --requests 2000
+    python scripts/bench_load.py --compare bench/old.json bench/new.json
+
+Results are saved to --output (default bench/<commit>.json) for --compare.
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import re
+import subprocess
+import sys
+import time
+from datetime import datetime
+from urllib.parse import urlencode, urlsplit
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wsgi import app
+from cache import NullCache
+from model import db, Venue, Artist
+from seed_data import explicit_database, reset, seed
+
+QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+def targets():
+    """(label, method, path, form) for every benchmarked view."""
+    with app.app_context():
+        # a mid-table id, so detail pages are neither empty nor the busiest
+        venue_id = db.session.query(Venue.id).order_by(Venue.id) \
+            .offset(db.session.query(Venue).count() // 2).limit(1).scalar()
+        artist_id = db.session.query(Artist.id).order_by(Artist.id) \
+            .offset(db.session.query(Artist).count() // 2).limit(1).scalar()
+    return [
+        ('/', 'GET', '/', None),
+        ('/venues', 'GET', '/venues', None),
+        ('/venues/search', 'POST', '/venues/search', {'search_term': 'the'}),
+        ('/venues/<id>', 'GET', '/venues/{}'.format(venue_id), None),
+        ('/artists/<id>', 'GET', '/artists/{}'.format(artist_id), None),
+        ('/shows', 'GET', '/shows', None),
+    ]
+
+
+def queries(headers):
+    # from the Server-Timing header, for HTTP; undercounts streamed pages
+    values = headers.getlist('Server-Timing') if hasattr(headers, 'getlist') else headers.get_all('Server-Timing')
+    match = QUERIES.search(', '.join(values or []))
+    return int(match.group(1)) if match else None
+
+
+def percentile(sorted_values, fraction):
+    # nearest rank
+    return sorted_values[max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values))) - 1))]
+
+
+def summary(label, latencies, query_counts, elapsed):
+    latencies = sorted(latencies)
+    query_counts = [count for count in query_counts if count is not None]
+    return {
+        'view': label,
+        'requests': len(latencies),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3),
+        'queries_per_request': round(sum(query_counts) / len(query_counts), 2) if query_counts else None,
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+    }
+
+#----------------------------------------------------------------------------#
+# Drivers.
+#----------------------------------------------------------------------------#
+
+def run_test_client(requests):
+    client = app.test_client()
+    results = []
+    # every statement, including those a streamed page runs after its headers
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(Engine, 'before_cursor_execute', record)
+    try:
+        for label, method, path, form in targets():
+            client.open(path, method=method, data=form)
+            latencies, query_counts = [], []
+            start = time.perf_counter()
+            for _ in range(requests):
+                del statements[:]
+                request_start = time.perf_counter()
+                response = client.open(path, method=method, data=form)
+                response.get_data()
+                latencies.append(time.perf_counter() - request_start)
+                query_counts.append(len(statements))
+            results.append(summary(label, latencies, query_counts, time.perf_counter() - start))
+    finally:
+        event.remove(Engine, 'before_cursor_execute', record)
+    return results
+
+
+def http_worker(args):
+    url, method, path, form, requests = args
+    parts = urlsplit(url)
+    connection = http.client.HTTPConnection(parts.hostname, parts.port or 80)
+    body = urlencode(form) if form else None
+    headers = {'Content-Type': 'application/x-www-form-urlencoded'} if form else {}
+    latencies, query_counts = [], []
+    for _ in range(requests):
+        start = time.perf_counter()
+        connection.request(method, parts.path.rstrip('/') + path, body=body, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - start)
+        query_counts.append(queries(response.headers))
+    connection.close()
+    return latencies, query_counts
+
+
+def run_http(url, requests, workers):
+    results = []
+    with multiprocessing.Pool(workers) as pool:
+        for label, method, path, form in targets():
+            http_worker((url, method, path, form, 1))
+            start = time.perf_counter()
+            shares = [(url, method, path, form, requests // workers + (i < requests % workers))
+                      for i in range(workers)]
+            latencies, query_counts = [], []
+            for worker_latencies, worker_queries in pool.map(http_worker, shares):
+                latencies += worker_latencies
+                query_counts += worker_queries
+            results.append(summary(label, latencies, query_counts, time.perf_counter() - start))
+    return results
+
+#----------------------------------------------------------------------------#
+# Reporting.
+#----------------------------------------------------------------------------#
+
+def print_results(results):
+    print('{:<8} {:<16} {:>9} {:>9} {:>9} {:>8} {:>10}'.format(
+        'scale', 'view', 'p50 ms', 'p95 ms', 'p99 ms', 'queries', 'req/s'))
+    for result in results:
+        print('{:<8} {:<16} {:>9.2f} {:>9.2f} {:>9.2f} {:>8} {:>10.1f}'.format(
+            result.get('scale') or '-', result['view'], result['p50_ms'], result['p95_ms'], result['p99_ms'],
+            '-' if result['queries_per_request'] is None else result['queries_per_request'],
+            result['throughput_rps']))
+
+
+def compare(old_path, new_path):
+    with open(old_path) as file:
+        old = {(result.get('scale'), result['view']): result for result in json.load(file)['results']}
+    with open(new_path) as file:
+        new = json.load(file)['results']
+    print('{:<8} {:<16} {:>10} {:>10} {:>10} {:>10}'.format('scale', 'view', 'p50', 'p95', 'p99', 'req/s'))
+    for result in new:
+        before = old.get((result.get('scale'), result['view']))
+        if before:
+            print('{:<8} {:<16} {:>9.2f}x {:>9.2f}x {:>9.2f}x {:>9.2f}x'.format(
+                result.get('scale') or '-', result['view'],
+                before['p50_ms'] / result['p50_ms'], before['p95_ms'] / result['p95_ms'],
+                before['p99_ms'] / result['p99_ms'], result['throughput_rps'] / before['throughput_rps']))
+
+
+def commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200, help='Requests per view.')
+    parser.add_argument('--scales', help='Comma separated venue counts to reseed with before each run.')
+    parser.add_argument('--url', help='Benchmark a running server instead of the test client.')
+    parser.add_argument('--workers', type=int, default=4, help='Client processes with --url.')
+    parser.add_argument('--cache', action='store_true', help='Keep the page cache on (test client).')
+    parser.add_argument('--output', help='Where to save the results (default bench/<commit>.json).')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='Compare two saved runs.')
+    args = parser.parse_args()
+    if args.scales and not explicit_database():
+        parser.error('--scales reseeds the database; set FYYUR_DATABASE_URI to a scratch database')
+
+    if args.compare:
+        return compare(*args.compare)
+    if not args.cache:
+        app.extensions['page_cache'].backend = NullCache()
+
+    results = []
+    for scale in [int(scale) for scale in args.scales.split(',')] if args.scales else [None]:
+        if scale is not None:
+            with app.app_context():
+                reset()
+                seed(scale, 2 * scale, 20 * scale)
+        run = run_http(args.url, args.requests, args.workers) if args.url else run_test_client(args.requests)
+        for result in run:
+            result['scale'] = scale
+        results += run
+        print_results(run)
+
+    with app.app_context():
+        database = db.engine.dialect.name
+    output = args.output or os.path.join('bench', '{}.json'.format(commit()))
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as file:
+        json.dump({
+            'commit': commit(),
+            'date': datetime.utcnow().isoformat(),
+            'database': database,
+            'mode': 'http' if args.url else 'test-client',
+            'workers': args.workers if args.url else 1,
+            'results': results,
+        }, file, indent=2)
+    print('saved', output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""Time to first response of a fresh worker, with and without warmup.
+
+Each run starts a new Python process that imports the app, as a gunicorn
+worker does, and requests every view once through the test client; that
+first pass is compared with the median of later requests. The page cache
+is off. Variants: no warmup, a prefilled JINJA_BYTECODE_CACHE_DIR,
+WARMUP_ON_START, and both.
+
+    python scripts/bench_startup.py             # 5 runs per variant
+    python scripts/bench_startup.py --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+START = time.perf_counter()
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+VARIANTS = (
+    ('cold', {}),
+    ('bytecode cache', {'bytecode': True}),
+    ('warmup', {'warmup': True}),
+    ('warmup + bytecode cache', {'warmup': True, 'bytecode': True}),
+)
+
+
+def child(targets, steady):
+    # runs in the fresh process; the import is what a worker does on boot
+    from wsgi import app
+    imported = time.perf_counter()
+    client = app.test_client()
+    first = {}
+    for label, method, path, form in targets:
+        start = time.perf_counter()
+        client.open(path, method=method, data=form).get_data()
+        first[label] = time.perf_counter() - start
+    latencies = {label: [] for label, _, _, _ in targets}
+    for _ in range(steady):
+        for label, method, path, form in targets:
+            start = time.perf_counter()
+            client.open(path, method=method, data=form).get_data()
+            latencies[label].append(time.perf_counter() - start)
+    print(json.dumps({
+        'import_s': imported - START,
+        'first_response_s': imported - START + next(iter(first.values())),
+        'first_ms': {label: seconds * 1000 for label, seconds in first.items()},
+        'steady_ms': {label: statistics.median(values) * 1000 for label, values in latencies.items()},
+    }))
+
+
+def run_child(options, targets, cache_dir, steady):
+    env = dict(os.environ, FYYUR_CACHE_TYPE='null',
+               FYYUR_WARMUP_ON_START='1' if options.get('warmup') else '0')
+    env.pop('FYYUR_JINJA_BYTECODE_CACHE_DIR', None)
+    if options.get('bytecode'):
+        env['FYYUR_JINJA_BYTECODE_CACHE_DIR'] = cache_dir
+    # re-run this script, through whatever launched it, as the child
+    command = [sys.executable] + sys.orig_argv[1:] + ['--child', json.dumps(targets), '--steady', str(steady)]
+    output = subprocess.run(command, env=env, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='Fresh processes per variant.')
+    parser.add_argument('--steady', type=int, default=20, help='Later requests per view for the baseline.')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(json.loads(args.child), args.steady)
+
+    from bench_load import targets
+    view_targets = targets()
+    with tempfile.TemporaryDirectory() as cache_dir:
+        # fill the bytecode cache, as `flask warmup` would on deploy
+        run_child({'warmup': True, 'bytecode': True}, view_targets, cache_dir, 1)
+        results = {}
+        for name, options in VARIANTS:
+            runs = [run_child(options, view_targets, cache_dir, args.steady) for _ in range(args.runs)]
+            results[name] = {
+                'import_s': statistics.median(run['import_s'] for run in runs),
+                'first_response_s': statistics.median(run['first_response_s'] for run in runs),
+                'first_ms': {label: statistics.median(run['first_ms'][label] for run in runs)
+                             for label in runs[0]['first_ms']},
+                'steady_ms': {label: statistics.median(run['steady_ms'][label] for run in runs)
+                              for label in runs[0]['steady_ms']},
+            }
+
+    labels = [label for label, _, _, _ in view_targets]
+    print('{:<24} {:>9} {:>11}  {}'.format('variant', 'import s', 'first resp', '  '.join(
+        '{:>14}'.format(label) for label in labels)))
+    for name, result in results.items():
+        print('{:<24} {:>9.3f} {:>10.3f}s  {}'.format(name, result['import_s'], result['first_response_s'], '  '.join(
+            '{:>14}'.format('{:.1f}ms'.format(result['first_ms'][label])) for label in labels)))
+    steady = results['cold']['steady_ms']
+    print('{:<24} {:>9} {:>11}  {}'.format('steady state (median)', '', '', '  '.join(
+        '{:>14}'.format('{:.1f}ms'.format(steady[label])) for label in labels)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Print the query plans of the main read views.
+
+Every statement issued while rendering each view is captured through the
+test client and re-run under EXPLAIN ANALYZE (EXPLAIN QUERY PLAN on SQLite)
+against the configured, already seeded database:
+
+    python scripts/explain_queries.py
+    python scripts/explain_queries.py /venues /shows?upcoming=1
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+
+from wsgi import app
+from model import db, Venue, Artist
+
+#----------------------------------------------------------------------------#
+# Views.
+#----------------------------------------------------------------------------#
+
+
+def default_views():
+    venue = db.session.query(Venue.id, Venue.name).order_by(Venue.id).first()
+    artist = db.session.query(Artist.id, Artist.name).order_by(Artist.id).first()
+    views = [('GET', '/', None), ('GET', '/venues', None), ('GET', '/artists', None),
+             ('GET', '/shows', None), ('GET', '/shows?upcoming=1', None)]
+    if venue:
+        views.append(('GET', '/venues/{}'.format(venue.id), None))
+        views.append(('POST', '/venues/search', {'search_term': venue.name[:3]}))
+    if artist:
+        views.append(('GET', '/artists/{}'.format(artist.id), None))
+        views.append(('POST', '/artists/search', {'search_term': artist.name[:3]}))
+    return views
+
+
+def capture(client, method, url, data):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        client.open(url, method=method, data=data)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+    return statements
+
+
+def explain(statement, parameters):
+    prefix = 'EXPLAIN ANALYZE ' if db.engine.dialect.name == 'postgresql' else 'EXPLAIN QUERY PLAN '
+    connection = db.engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(prefix + statement, parameters)
+        return [' '.join(str(column) for column in row) for row in cursor.fetchall()]
+    finally:
+        connection.close()
+
+
+def main(urls):
+    with app.app_context():
+        if urls:
+            views = [('GET', url, None) for url in urls]
+        else:
+            views = default_views()
+        client = app.test_client()
+        for method, url, data in views:
+            statements = capture(client, method, url, data)
+            print('=' * 78)
+            print('{} {}  ({} queries)'.format(method, url, len(statements)))
+            for statement, parameters in statements:
+                if not statement.lstrip().upper().startswith('SELECT'):
+                    continue
+                print('-' * 78)
+                print(statement.strip())
+                print('params: {!r}'.format(parameters))
+                for line in explain(statement, parameters):
+                    print('  ' + line)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,167 @@
+"""Seeds the configured database with synthetic venues, artists and shows.
+
+Cities follow a population-weighted list, genres a Zipf-like popularity
+curve, and shows cluster on a few popular venues and artists, spread over
+the past and next year. The same --seed always produces the same data.
+
+    python scripts/seed_data.py                       # 1000 venues, 2000 artists, 20000 shows
+    FYYUR_DATABASE_URI=postgresql:///fyyur_bench python scripts/seed_data.py --venues 100 --reset
+
+--reset deletes all venues, artists and shows first, and so refuses to run
+unless FYYUR_DATABASE_URI names the database explicitly.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wsgi import app
+from cache import page_cache
+from forms import VenueForm
+from importer import allocate_ids, genre_ids
+from model import db, Venue, Artist, Show, venue_genres, artist_genres, refresh_show_counters
+from search import ngram_search
+from upcoming import refresh_upcoming_shows
+
+# (city, state, relative weight), roughly by metro population
+CITIES = [
+    ('New York', 'NY', 19.6), ('Los Angeles', 'CA', 13.0), ('Chicago', 'IL', 9.4),
+    ('Dallas', 'TX', 7.6), ('Houston', 'TX', 7.1), ('Washington', 'DC', 6.3),
+    ('Philadelphia', 'PA', 6.2), ('Miami', 'FL', 6.1), ('Atlanta', 'GA', 6.0),
+    ('Boston', 'MA', 4.9), ('Phoenix', 'AZ', 4.8), ('San Francisco', 'CA', 4.7),
+    ('Seattle', 'WA', 4.0), ('Minneapolis', 'MN', 3.7), ('San Diego', 'CA', 3.3),
+    ('Denver', 'CO', 2.9), ('Baltimore', 'MD', 2.8), ('St. Louis', 'MO', 2.8),
+    ('Portland', 'OR', 2.5), ('Austin', 'TX', 2.3), ('Nashville', 'TN', 2.0),
+    ('New Orleans', 'LA', 1.3),
+]
+
+GENRES = [name for name, _ in VenueForm.genres.kwargs['choices']]
+GENRE_WEIGHTS = [1.0 / rank for rank in range(1, len(GENRES) + 1)]
+
+NAME_WORDS = ['Blue', 'Red', 'Velvet', 'Golden', 'Electric', 'Silver', 'Midnight', 'Crystal',
+              'Iron', 'Wild', 'Lucky', 'Neon', 'Paper', 'Stone', 'Hollow', 'Echo']
+VENUE_KINDS = ['Hall', 'Lounge', 'Room', 'Club', 'Theatre', 'Tavern', 'Ballroom', 'Garden']
+ARTIST_KINDS = ['Band', 'Trio', 'Collective', 'Project', 'Orchestra', 'Quartet', 'Kings', 'Sisters']
+
+
+def pick_genres(rng):
+    return set(rng.choices(GENRES, GENRE_WEIGHTS, k=rng.randint(1, 3)))
+
+
+def owner_rows(rng, count, kinds, extra):
+    for i in range(count):
+        city, state, _ = rng.choices(CITIES, [weight for _, _, weight in CITIES])[0]
+        row = {
+            'name': 'The {} {} {}'.format(rng.choice(NAME_WORDS), rng.choice(kinds), i),
+            'city': city, 'state': state,
+            'phone': '{}-{}-{:04d}'.format(rng.randint(200, 999), rng.randint(200, 999), rng.randint(0, 9999)),
+            'image_link': 'https://picsum.photos/seed/{}{}/300'.format(kinds[0].lower(), i),
+            'facebook_link': 'https://www.facebook.com/{}{}'.format(kinds[0].lower(), i),
+        }
+        row.update(extra(rng, i))
+        yield row, pick_genres(rng)
+
+
+def insert_owners(model, association, owner_key, rows, batch_size):
+    ids = []
+    rows = list(rows)
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        batch_ids = allocate_ids(model.__table__, len(batch))
+        genres = genre_ids(name for _, names in batch for name in names)
+        mappings, links = [], []
+        for id, (row, names) in zip(batch_ids, batch):
+            mappings.append(dict(row, id=id))
+            links.extend({'genre_id': genres[name], owner_key: id} for name in names)
+        db.session.bulk_insert_mappings(model, mappings)
+        db.session.execute(association.insert(), links)
+        db.session.commit()
+        ids.extend(batch_ids)
+    return ids
+
+
+def popularity(rng, ids):
+    # Pareto weights: a few venues and artists get most of the shows
+    return [rng.paretovariate(1.2) for _ in ids]
+
+
+def seed(venues, artists, shows, seed=0, batch_size=5000):
+    """Inserts the requested numbers of rows; returns the new venue and artist ids."""
+    rng = random.Random(seed)
+    venue_ids = insert_owners(Venue, venue_genres, 'venue_id', owner_rows(
+        rng, venues, VENUE_KINDS, lambda rng, i: {
+            'address': '{} {} St'.format(rng.randint(1, 9999), rng.choice(NAME_WORDS)),
+            'website_link': 'https://venue{}.example.com'.format(i),
+            'seeking_talent': rng.random() < 0.3,
+            'seeking_description': 'Looking for local acts.',
+        }), batch_size)
+    artist_ids = insert_owners(Artist, artist_genres, 'artist_id', owner_rows(
+        rng, artists, ARTIST_KINDS, lambda rng, i: {
+            'website_link': 'https://artist{}.example.com'.format(i),
+            'seeking_venue': rng.random() < 0.4,
+            'seeking_description': 'Booking for next season.',
+        }), batch_size)
+
+    venue_weights, artist_weights = popularity(rng, venue_ids), popularity(rng, artist_ids)
+    now = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    for start in range(0, shows, batch_size):
+        count = min(batch_size, shows - start)
+        db.session.bulk_insert_mappings(Show, [{
+            'venue_id': venue_id,
+            'artist_id': artist_id,
+            # evenings, within a year either side of today
+            'start_time': now + timedelta(days=rng.randint(-365, 365), hours=rng.randint(18, 23) - now.hour),
+        } for venue_id, artist_id in zip(rng.choices(venue_ids, venue_weights, k=count),
+                                         rng.choices(artist_ids, artist_weights, k=count))])
+        db.session.commit()
+    refresh_show_counters(db.session, venue_ids, artist_ids)
+    refresh_upcoming_shows(db.session.connection())
+    db.session.commit()
+    # bulk inserts skip the mapper events that keep the n-gram index fresh
+    ngram_search().invalidate(Venue)
+    ngram_search().invalidate(Artist)
+    return venue_ids, artist_ids
+
+
+def explicit_database():
+    # the database given in the environment rather than config.py's default
+    return os.environ.get('FYYUR_DATABASE_URI')
+
+
+def reset():
+    if not explicit_database():
+        raise RuntimeError('reset() needs FYYUR_DATABASE_URI set to the database it empties')
+    for table in (Show.__table__, venue_genres, artist_genres, Venue.__table__, Artist.__table__):
+        db.session.execute(table.delete())
+    db.session.commit()
+    ngram_search().invalidate(Venue)
+    ngram_search().invalidate(Artist)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--venues', type=int, default=1000)
+    parser.add_argument('--artists', type=int, default=2000)
+    parser.add_argument('--shows', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--reset', action='store_true', help='Delete all venues, artists and shows first.')
+    args = parser.parse_args()
+    if args.reset and not explicit_database():
+        parser.error('--reset needs FYYUR_DATABASE_URI set to the database it empties')
+
+    with app.app_context():
+        start = time.perf_counter()
+        if args.reset:
+            reset()
+        seed(args.venues, args.artists, args.shows, args.seed)
+        page_cache.invalidate('home', 'venues', 'artists', 'shows')
+        print('{} venues, {} artists, {} shows in {:.1f}s'.format(
+            args.venues, args.artists, args.shows, time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+from collections import defaultdict
+from difflib import SequenceMatcher
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+
+from model import db, Venue, Artist, Genre, venue_genres, artist_genres
+
+#----------------------------------------------------------------------------#
+# Search backends.
+#----------------------------------------------------------------------------#
+
+# Fields searched for each model and how much a match in each one counts
+# towards the relevance of a row. genres is matched through the Genre table.
+SEARCH_FIELDS = (
+    ('name', 1.0),
+    ('city', 0.6),
+    ('genres', 0.4),
+)
+COLUMN_FIELDS = SEARCH_FIELDS[:2]
+
+# association table column linking each model to its genres
+GENRE_OWNERS = {Venue: venue_genres.c.venue_id, Artist: artist_genres.c.artist_id}
+
+
+def ngrams(text, n=3):
+    text = (text or '').lower()
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+class TrigramSearch:
+    """Search backed by pg_trgm GIN indexes on PostgreSQL.
+
+    Each field is matched on its own, so that every ILIKE '%term%' is
+    answered from its trigram index (name and city from the 9d1c3e7a5b20
+    migration, Genre.name from e5b7d2a9c614); an OR across them would be a
+    sequential scan. The matching ids are UNIONed and ranked by trigram
+    similarity.
+    """
+
+    def matches(self, model, like):
+        owner_id = GENRE_OWNERS[model]
+        return db.union(
+            *[db.select([model.id.label('id')]).where(getattr(model, field).ilike(like))
+              for field, _ in COLUMN_FIELDS],
+            db.select([owner_id.label('id')])
+              .select_from(owner_id.table.join(Genre, Genre.id == owner_id.table.c.genre_id))
+              .where(Genre.name.ilike(like))
+        ).subquery()
+
+    def search(self, model, term, limit, offset):
+        like = '%{}%'.format(term)
+        columns = [(getattr(model, field), weight) for field, weight in COLUMN_FIELDS]
+        matches = self.matches(model, like)
+
+        rank = db.func.greatest(*[
+            db.func.similarity(db.func.coalesce(column, ''), term) * weight
+            for column, weight in columns
+        ])
+
+        count = db.session.query(db.func.count()).select_from(matches).scalar()
+        ids = db.session.query(model.id).join(matches, matches.c.id == model.id) \
+            .order_by(model.name.ilike(like).desc(), rank.desc(), model.name, model.id) \
+            .limit(limit).offset(offset).all()
+        return count, [id for id, in ids]
+
+
+class NgramSearch:
+    """In-process trigram index used when the database has no pg_trgm (SQLite).
+
+    Each model's index is built on first use from two queries and dropped
+    whenever a row of that model is inserted, updated or deleted by this
+    process, which is enough for tests and single-process development. Every
+    app has its own, in app.extensions['ngram_search'].
+    """
+
+    def __init__(self):
+        self.indexes = {}
+
+    def invalidate(self, model):
+        self.indexes.pop(model, None)
+
+    def build(self, model):
+        genres = defaultdict(list)
+        for id, genre in db.session.query(model.id, Genre.name).join(model.genres):
+            genres[id].append(genre.lower())
+
+        postings = defaultdict(set)
+        documents = {}
+        columns = [getattr(model, field) for field, _ in COLUMN_FIELDS]
+        for row in db.session.query(model.id, *columns):
+            fields = [(value or '').lower() for value in row[1:]] + [','.join(genres[row[0]])]
+            documents[row[0]] = fields
+            for gram in ngrams('\n'.join(fields)):
+                postings[gram].add(row[0])
+        return postings, documents
+
+    def search(self, model, term, limit, offset):
+        if model not in self.indexes:
+            self.indexes[model] = self.build(model)
+        postings, documents = self.indexes[model]
+
+        term = term.lower().strip()
+        candidates = documents.keys()
+        if len(term) >= 3:
+            candidates = set.intersection(*[postings.get(gram, set()) for gram in ngrams(term)])
+
+        ranked = []
+        for id in candidates:
+            fields = documents[id]
+            scores = [weight * SequenceMatcher(None, term, value).ratio()
+                      for value, (_, weight) in zip(fields, SEARCH_FIELDS) if term in value]
+            if scores:
+                ranked.append((term not in fields[0], -max(scores), fields[0], id))
+        ranked.sort()
+        return len(ranked), [id for *_, id in ranked[offset:offset + limit]]
+
+
+trigram_search = TrigramSearch()
+
+
+def ngram_search():
+    """The current app's NgramSearch."""
+    return current_app.extensions.setdefault('ngram_search', NgramSearch())
+
+
+def search_backend():
+    if db.engine.dialect.name == 'postgresql':
+        return trigram_search
+    return ngram_search()
+
+
+def _invalidate_ngram_index(model):
+    def listener(mapper, connection, target):
+        if has_app_context():
+            ngram_search().invalidate(model)
+    return listener
+
+
+for _model in (Venue, Artist):
+    for _event in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(_model, _event, _invalidate_ngram_index(_model))
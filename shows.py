@@ -0,0 +1,126 @@
+from datetime import datetime, timedelta
+from itertools import chain
+
+from flask import Blueprint, abort, current_app, flash, render_template, request, url_for
+
+from cache import page_cache
+from conditional import conditional
+from model import db, Venue, Artist, Show
+from views import page_state, shows_state, stream_template
+
+blueprint = Blueprint('shows', __name__)
+
+#----------------------------------------------------------------------------#
+# Page state.
+#----------------------------------------------------------------------------#
+
+def shows_page_state():
+  return page_state(*shows_state())
+
+
+class ShowsPage:
+  # one keyset page of /shows tiles for a streamed template; next_url is set
+  # once the extra row past the page shows there is more
+  def __init__(self, rows, per_page, filters):
+    self.rows = rows
+    self.per_page = per_page
+    self.filters = filters
+    self.next_url = None
+
+  def __iter__(self):
+    for i, (id, start_time, venue_id, venue_name, artist_id, artist_name, artist_image_link) in enumerate(self.rows):
+      if i == self.per_page:
+        cursor = '{}_{}'.format(last[1].isoformat(), last[0])
+        self.next_url = url_for('shows.shows', after=cursor, **self.filters)
+        return
+      last = (id, start_time)
+      yield {
+        "venue_id": venue_id,
+        "venue_name": venue_name,
+        "artist_id": artist_id,
+        "artist_name": artist_name,
+        "artist_image_link": artist_image_link,
+        "start_time": start_time
+        }
+
+#----------------------------------------------------------------------------#
+# Controllers.
+#----------------------------------------------------------------------------#
+
+@blueprint.route('/shows')
+@conditional(shows_page_state)
+@page_cache.cached('shows')
+def shows():
+  # displays list of shows at /shows, one keyset page at a time
+  # optional filters: ?upcoming=1, ?from=YYYY-MM-DD, ?to=YYYY-MM-DD
+  per_page = current_app.config['SHOWS_PAGE_SIZE']
+  filters = {key: request.args[key] for key in ('upcoming', 'from', 'to') if request.args.get(key)}
+
+  query = db.session.query(
+      Show.id, Show.start_time,
+      Show.venue_id, Venue.name,
+      Show.artist_id, Artist.name, Artist.image_link
+    ).join(Venue, Show.venue_id == Venue.id).join(Artist, Show.artist_id == Artist.id)
+
+  try:
+    if filters.get('upcoming'):
+      query = query.filter(Show.start_time > datetime.utcnow())
+    if 'from' in filters:
+      query = query.filter(Show.start_time >= datetime.strptime(filters['from'], '%Y-%m-%d'))
+    if 'to' in filters:
+      query = query.filter(Show.start_time < datetime.strptime(filters['to'], '%Y-%m-%d') + timedelta(days=1))
+    if request.args.get('after'):
+      after_time, after_id = request.args['after'].rsplit('_', 1)
+      after_time, after_id = datetime.fromisoformat(after_time), int(after_id)
+      # keyset pagination: seek past the last (start_time, id) of the previous page
+      query = query.filter(db.or_(
+        Show.start_time > after_time,
+        db.and_(Show.start_time == after_time, Show.id > after_id)))
+  except ValueError:
+    abort(400)
+
+  rows = iter(query.order_by(Show.start_time, Show.id).limit(per_page + 1)
+              .yield_per(current_app.config['LISTING_YIELD_PER']))
+  first = next(rows, None)
+  if first is not None:
+    if filters.get('upcoming'):
+      # the first show on the page drops out of the listing once it starts
+      page_cache.expire_at(first[1])
+    rows = chain([first], rows)
+
+  return stream_template('pages/shows.html', shows=ShowsPage(rows, per_page, filters))
+
+
+@blueprint.route('/shows/create')
+def create_shows():
+  # renders form. do not touch.
+  # forms.py, and with it Flask-WTF and Babel, loads with the first form
+  from forms import ShowForm
+  form = ShowForm()
+  return render_template('forms/new_show.html', form=form)
+
+
+@blueprint.route('/shows/create', methods=['POST'])
+def create_show_submission():
+  # called to create new shows in the db, upon submitting new show listing form
+
+  new_show = Show()
+  new_show.artist_id = request.form['artist_id']
+  new_show.venue_id = request.form['venue_id']
+  new_show.start_time = request.form['start_time']
+
+  try:
+    db.session.add(new_show)
+    db.session.commit()
+    page_cache.invalidate('shows', 'venues',
+      'venue:{}'.format(new_show.venue_id), 'artist:{}'.format(new_show.artist_id))
+    # on successful db insert, flash success
+    flash('Show was successfully listed!')
+
+  except:
+    db.session.rollback()
+    flash('An error occurred. Show could not be listed.')
+
+  finally:
+    db.session.close()
+  return render_template('pages/home.html')
@@ -0,0 +1,89 @@
+import unittest
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from app import create_app
+from model import db, Artist, Genre, Show, Venue
+
+
+class QueryCountTest(unittest.TestCase):
+    """Pages run the same statements however much data they render."""
+
+    def setUp(self):
+        self.app = create_app({
+            'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+            'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+            'CACHE_TYPE': 'null',
+            'SLOW_QUERY_LOG': None,
+            'WARMUP_ON_START': False,
+        })
+        with self.app.app_context():
+            db.create_all()
+            self.engine = db.engine
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        self.engine.dispose()
+
+    @contextmanager
+    def statements(self):
+        executed = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            executed.append(statement)
+        event.listen(self.engine, 'before_cursor_execute', record)
+        try:
+            yield executed
+        finally:
+            event.remove(self.engine, 'before_cursor_execute', record)
+
+    def get(self, url):
+        with self.statements() as executed:
+            response = self.client.get(url)
+            response.get_data()
+        self.assertEqual(response.status_code, 200)
+        return len(executed)
+
+    def add_areas(self, areas):
+        with self.app.app_context():
+            db.session.add_all(
+                Venue(name='Venue {} {}'.format(area, i), city='City {}'.format(area), state='CA', address='1 Main St')
+                for area in areas for i in range(2))
+            db.session.commit()
+
+    def test_venues_listing(self):
+        # N areas, then 10N
+        self.add_areas(range(5))
+        few = self.get('/venues')
+        self.add_areas(range(5, 50))
+        self.assertEqual(self.get('/venues'), few)
+
+    def add_shows(self, count):
+        # past and upcoming shows of venue 1 and artist 1, each with its own
+        # artist or venue on the other side
+        now = datetime.utcnow()
+        with self.app.app_context():
+            venue, artist = Venue.query.get(1), Artist.query.get(1)
+            for i in range(count):
+                start_time = now + timedelta(days=i - count // 2)
+                db.session.add(Show(venue=venue, artist=Artist(name='Artist {}'.format(i)), start_time=start_time))
+                db.session.add(Show(artist=artist, venue=Venue(name='Venue {}'.format(i)), start_time=start_time))
+            db.session.commit()
+
+    def test_detail_pages(self):
+        with self.app.app_context():
+            genres = Genre.get_or_create_all(['Jazz', 'Rock'])
+            db.session.add_all([Venue(id=1, name='The Venue', genres=genres),
+                                Artist(id=1, name='The Artist', genres=genres)])
+            db.session.commit()
+        for shows in (2, 20):
+            self.add_shows(shows)
+            for url in ('/venues/1', '/artists/1'):
+                # the page's ETag state, then the entity with its genres, then its shows
+                self.assertLessEqual(self.get(url), 3, '{} with {} shows'.format(url, shows))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+
+from app import create_app
+from model import db, Venue
+
+UPDATED_AT = datetime(2026, 1, 1)
+
+
+class ReadYourWritesTest(unittest.TestCase):
+    """A primary and a lagging replica, as two SQLite files."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        primary = 'sqlite:///' + os.path.join(self.directory, 'primary.db')
+        replica = 'sqlite:///' + os.path.join(self.directory, 'replica.db')
+        self.app = create_app({
+            'SQLALCHEMY_DATABASE_URI': primary,
+            'SQLALCHEMY_REPLICA_URIS': [replica],
+            'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+            'SECRET_KEY': 'test',
+            'CACHE_TYPE': 'simple',
+            'SLOW_QUERY_LOG': None,
+            'WARMUP_ON_START': False,
+        })
+        with self.app.app_context():
+            for bind in (None, 'replica_0'):
+                engine = db.get_engine(self.app, bind=bind)
+                db.Model.metadata.create_all(engine)
+                engine.execute(Venue.__table__.insert(), [
+                    dict(id=id, name=name, city='San Francisco', state='CA', address='1 Main St',
+                         updated_at=UPDATED_AT)
+                    for id, name in ((1, 'Old Name'), (2, 'Other Venue'))])
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            for bind in (None, 'replica_0'):
+                db.get_engine(self.app, bind=bind).dispose()
+        state = self.app.extensions['async_db']
+        state.run(state.dispose())
+        shutil.rmtree(self.directory)
+
+    def edit_venue(self, client, name, venue_id=1):
+        return client.post('/venues/{}/edit'.format(venue_id), data={
+            'name': name, 'city': 'San Francisco', 'state': 'CA', 'address': '1 Main St',
+            'phone': '', 'facebook_link': '', 'image_link': '', 'website_link': ''})
+
+    def test_writer_reads_its_write_from_the_primary(self):
+        writer, reader = self.app.test_client(), self.app.test_client()
+        self.assertIn(b'Old Name', writer.get('/venues/1').get_data())
+
+        self.assertEqual(self.edit_venue(writer, 'New Name').status_code, 302)
+        # the replica has not caught up: other clients still read the old name
+        self.assertIn(b'Old Name', reader.get('/venues/1').get_data())
+        self.assertIn(b'New Name', writer.get('/venues/1').get_data())
+        self.assertIn(b'New Name', writer.get('/venues/1').get_data())
+
+    def test_pages_read_from_a_replica_are_not_served_to_the_writer(self):
+        writer, reader = self.app.test_client(), self.app.test_client()
+        # the replica holds another name under the same state, so the page it
+        # renders gets the same ETag as the primary's would
+        with self.app.app_context():
+            db.get_engine(self.app, bind='replica_0').execute(
+                Venue.__table__.update().where(Venue.id == 1).values(name='Replica Name', updated_at=UPDATED_AT))
+        self.assertIn(b'Replica Name', reader.get('/venues/1').get_data())
+
+        # a write elsewhere keeps the writer on the primary for a while
+        self.assertEqual(self.edit_venue(writer, 'Renamed Venue', venue_id=2).status_code, 302)
+        self.assertIn(b'Old Name', writer.get('/venues/1').get_data())
+        self.assertIn(b'Replica Name', reader.get('/venues/1').get_data())
+
+    def test_api_reads_are_routed_the_same_way(self):
+        writer, reader = self.app.test_client(), self.app.test_client()
+        with self.app.app_context():
+            db.get_engine(self.app, bind='replica_0').execute(
+                Venue.__table__.update().where(Venue.id == 1).values(name='Replica Name'))
+        self.assertEqual(reader.get('/api/v1/venues/1').get_json()['name'], 'Replica Name')
+
+        self.assertEqual(self.edit_venue(writer, 'Renamed Venue', venue_id=2).status_code, 302)
+        self.assertEqual(writer.get('/api/v1/venues/1').get_json()['name'], 'Old Name')
+        self.assertEqual(reader.get('/api/v1/venues/1').get_json()['name'], 'Replica Name')
+
+    def test_replicas_need_a_fixed_secret_key(self):
+        with self.assertRaises(ValueError):
+            create_app({
+                'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+                'SQLALCHEMY_REPLICA_URIS': ['sqlite://'],
+                'SECRET_KEY': None,
+                'WARMUP_ON_START': False,
+            })
+
+
+if __name__ == '__main__':
+    unittest.main()
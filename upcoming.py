@@ -0,0 +1,107 @@
+from datetime import datetime
+
+import click
+import sqlalchemy as sa
+from flask import current_app
+from flask.cli import AppGroup
+
+from model import db, Venue, Artist, Show
+
+#----------------------------------------------------------------------------#
+# Upcoming shows view.
+#----------------------------------------------------------------------------#
+
+# A PostgreSQL materialized view (a plain summary table elsewhere) of upcoming
+# shows with their venue and artist names, created by migration a9c4e2f7d1b3.
+# It lives outside db.metadata so create_all() never makes it a table on
+# PostgreSQL. Rows can be up to one refresh old, so readers still filter on
+# start_time.
+upcoming_shows = sa.Table(
+    'upcoming_shows', sa.MetaData(),
+    sa.Column('show_id', sa.Integer, primary_key=True),
+    sa.Column('start_time', sa.DateTime, nullable=False, index=True),
+    sa.Column('venue_id', sa.Integer, nullable=False),
+    sa.Column('venue_name', sa.String),
+    sa.Column('venue_image_link', sa.String(500)),
+    sa.Column('artist_id', sa.Integer, nullable=False),
+    sa.Column('artist_name', sa.String),
+    sa.Column('artist_image_link', sa.String(500)),
+)
+
+
+def upcoming_select(now):
+    return sa.select([
+        Show.id, Show.start_time,
+        Show.venue_id, Venue.name, Venue.image_link,
+        Show.artist_id, Artist.name, Artist.image_link,
+    ]).select_from(Show.__table__.join(Venue.__table__).join(Artist.__table__)) \
+        .where(Show.start_time > now)
+
+
+def refresh_upcoming_shows(connection):
+    """Rebuilds upcoming_shows; readers keep seeing the old rows meanwhile."""
+    if connection.dialect.name == 'postgresql':
+        connection.execute(sa.text('REFRESH MATERIALIZED VIEW CONCURRENTLY upcoming_shows'))
+    else:
+        upcoming_shows.create(connection, checkfirst=True)
+        connection.execute(upcoming_shows.delete())
+        connection.execute(upcoming_shows.insert().from_select(
+            [column.name for column in upcoming_shows.columns], upcoming_select(datetime.utcnow())))
+
+
+# the venue and artist columns the view copies next to each show
+PROJECTED_COLUMNS = ('name', 'image_link')
+
+
+def changes_upcoming_shows(session):
+    # shows added, edited or deleted (a deleted venue or artist deletes its
+    # shows too), and venues or artists renamed or given a new image; other
+    # edits leave the view as it is
+    if any(isinstance(instance, Show) for instance in list(session.new) + list(session.deleted)):
+        return True
+    for instance in session.dirty:
+        if isinstance(instance, Show) and session.is_modified(instance):
+            return True
+        if isinstance(instance, (Venue, Artist)):
+            attrs = db.inspect(instance).attrs
+            if any(attrs[name].history.has_changes() for name in PROJECTED_COLUMNS):
+                return True
+    return False
+
+
+@sa.event.listens_for(db.session, 'after_flush')
+def note_show_writes(session, flush_context):
+    if changes_upcoming_shows(session):
+        session.info['upcoming_stale'] = True
+
+
+@sa.event.listens_for(db.session, 'after_rollback')
+def forget_show_writes(session):
+    session.info.pop('upcoming_stale', None)
+
+
+@sa.event.listens_for(db.session, 'after_commit')
+def refresh_after_show_writes(session):
+    if session.info.pop('upcoming_stale', False) and current_app.config.get('UPCOMING_REFRESH_ON_WRITE', True):
+        # the write itself has committed; a failed refresh is caught up by
+        # the next one or by the scheduled `flask calendar refresh`
+        try:
+            with db.engine.begin() as connection:
+                refresh_upcoming_shows(connection)
+        except sa.exc.SQLAlchemyError:
+            current_app.logger.exception('Refreshing upcoming_shows failed')
+
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+calendar_command = AppGroup('calendar', help='Maintain the upcoming shows calendar view.')
+
+
+@calendar_command.command('refresh')
+def refresh_command():
+    """Refresh upcoming_shows; schedule it so past shows drop out of the view."""
+    with db.engine.begin() as connection:
+        refresh_upcoming_shows(connection)
+        count = connection.execute(sa.select([sa.func.count()]).select_from(upcoming_shows)).scalar()
+    click.echo('{} upcoming shows'.format(count))
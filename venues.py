@@ -0,0 +1,219 @@
+from itertools import groupby
+
+from flask import Blueprint, current_app, flash, redirect, render_template, request, url_for
+
+from cache import page_cache
+from conditional import conditional
+from model import db, Venue, Show, Genre, venue_genres
+from views import page_state, partition_shows, request_page, search_with_upcoming_counts, shows_state, \
+  stream_template, table_state
+
+blueprint = Blueprint('venues', __name__)
+
+#----------------------------------------------------------------------------#
+# Page state.
+#----------------------------------------------------------------------------#
+
+def venue_page_tags(venue_id):
+  # cache tags of every page that renders this venue's details
+  artist_ids = db.session.query(Show.artist_id).filter(Show.venue_id == venue_id).distinct()
+  return ['home', 'venues', 'shows', 'venue:{}'.format(venue_id)] + \
+    ['artist:{}'.format(artist_id) for artist_id, in artist_ids]
+
+
+def venues_state():
+  # show writes and rollovers update the venues' counters and updated_at
+  return page_state(*table_state(Venue))
+
+
+def venue_state(venue_id):
+  return page_state(*table_state(Venue, Venue.id == venue_id) + shows_state(Show.venue_id == venue_id))
+
+#----------------------------------------------------------------------------#
+# Controllers.
+#----------------------------------------------------------------------------#
+
+@blueprint.route('/venues')
+@conditional(venues_state)
+@page_cache.cached('venues')
+def venues():
+  # one ordered query for every venue with its stored upcoming show count,
+  # streamed from a server-side cursor; areas are grouped as the rows arrive
+  # so the query count does not grow with the number of areas
+  query = db.session.query(Venue.id, Venue.name, Venue.city, Venue.state, Venue.upcoming_shows_count)
+  if request.args.get('genre'):
+    # served from the venue_genres (genre_id, venue_id) primary key
+    query = query.join(venue_genres, venue_genres.c.venue_id == Venue.id) \
+      .join(Genre, Genre.id == venue_genres.c.genre_id) \
+      .filter(Genre.name == request.args['genre'])
+  rows = query.order_by(Venue.city, Venue.state, Venue.id).yield_per(current_app.config['LISTING_YIELD_PER'])
+
+  data = ({
+    "city": city,
+    "state": state,
+    "venues": ({
+      "id": venue_id,
+      "name": name,
+      "num_upcoming_shows": num_upcoming_shows
+      } for venue_id, name, _, _, num_upcoming_shows in area_rows)
+    } for (city, state), area_rows in groupby(rows, key=lambda row: (row.city, row.state)))
+  return stream_template('pages/venues.html', areas=data)
+
+
+@blueprint.route('/venues/search', methods=['POST'])
+def search_venues():
+  search_term = request.form.get('search_term', '')
+  response = search_with_upcoming_counts(Venue, search_term, request_page())
+
+  return render_template('pages/search_venues.html', data_returned=response, search_term=search_term)
+
+
+@blueprint.route('/venues/<int:venue_id>')
+@conditional(venue_state)
+@page_cache.cached('venue:{venue_id}')
+def show_venue(venue_id):
+  # two queries: the venue, then its shows joined with their artists
+  venue = Venue.query.options(
+      db.joinedload(Venue.genres),
+      db.selectinload(Venue.shows).joinedload(Show.artist)
+    ).get_or_404(venue_id)
+
+  past_shows, upcoming_shows = partition_shows(venue.shows, lambda show: {
+    "artist_id": show.artist_id,
+    "artist_name": show.artist.name,
+    "artist_image_link": show.artist.image_link,
+    "start_time": show.start_time
+    })
+
+  data={
+    "id": venue.id,
+    "name": venue.name,
+    "genres": venue.genre_names,
+    "address": venue.address,
+    "city": venue.city,
+    "state": venue.state,
+    "phone": venue.phone,
+    "website_link": venue.website_link,
+    "facebook_link": venue.facebook_link,
+    "seeking_talent": venue.seeking_talent,
+    "seeking_description": venue.seeking_description,
+    "image_link": venue.image_link,
+    "past_shows": past_shows,
+    "upcoming_shows": upcoming_shows,
+    "past_shows_count": len(past_shows),
+    "upcoming_shows_count": len(upcoming_shows)
+  }
+
+  return render_template('pages/show_venue.html', venue=data)
+
+#  Create Venue
+#  ----------------------------------------------------------------
+
+
+@blueprint.route('/venues/create', methods=['GET'])
+def create_venue_form():
+  # forms.py, and with it Flask-WTF and Babel, loads with the first form
+  from forms import VenueForm
+  form = VenueForm()
+  return render_template('forms/new_venue.html', form=form)
+
+
+@blueprint.route('/venues/create', methods=['POST'])
+def create_venue_submission():
+  # TODO: insert form data as a new Venue record in the db, instead modify data to be the data object returned from db insertion
+  from forms import VenueForm
+  form = VenueForm(request.form)
+
+  if form.validate():
+    try:
+      venue= Venue(
+        name = form.name.data,
+        genres = Genre.get_or_create_all(form.genres.data),
+        address = form.address.data,
+        city = form.city.data,
+        state = form.state.data,
+        phone = form.phone.data,
+        facebook_link = form.facebook_link.data,
+        website_link = form.website_link.data,
+        seeking_talent = form.seeking_talent.data,
+        seeking_description = form.seeking_description.data,
+        image_link = form.image_link.data
+      )
+
+      db.session.add(venue)
+      db.session.commit()
+      page_cache.invalidate('home', 'venues')
+        # on successful db insert, flash success
+      flash('Venue ' + form.name.data + ' was successfully listed!')
+
+    except:
+          db.session.rollback()
+            # TODO: on unsuccessful db insert, flash an e
+          flash('An error occurred. Venue ' + form.name.data + ' could not be listed.')
+
+    finally:
+          db.session.close()
+
+    return render_template('pages/home.html')
+
+
+@blueprint.route('/venues/<int:venue_id>', methods=['DELETE'])
+def delete_venue(venue_id):
+  # TODO: Implement a button to delete a Venue on a Venue Page, then redirect the user to the homepage
+
+  try:
+        deleted_venue = Venue.query.get_or_404(venue_id)
+        tags = venue_page_tags(venue_id)
+        db.session.delete(deleted_venue)
+        db.session.commit()
+        page_cache.invalidate(*tags)
+        flash("Venue " + deleted_venue.name + " was deleted successfully!")
+  except:
+        db.session.rollback()
+
+        flash("Venue was not deleted successfully.")
+  finally:
+        db.session.close()
+
+  return redirect(url_for("index"))
+
+#  Update
+#  ----------------------------------------------------------------
+
+
+@blueprint.route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+  # TODO: populate form with datas from venue with ID <venue_id>
+  from forms import VenueForm
+
+  form = VenueForm(request.form)
+  venue = db.session.query(Venue).filter(Venue.id == venue_id).one()
+
+  return render_template('forms/edit_venue.html', form=form, venue=venue)
+
+
+@blueprint.route('/venues/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+  # TODO: take datas from the form submitted, and update existing
+
+        venue = Venue.query.get(venue_id)
+        venue.name = request.form['name']
+        venue.city = request.form['city']
+        venue.state = request.form['state']
+        venue.address = request.form['address']
+        venue.phone = request.form['phone']
+        venue.facebook_link = request.form['facebook_link']
+        venue.genres = Genre.get_or_create_all(request.form.getlist('genres'))
+        venue.image_link = request.form['image_link']
+        venue.website_link = request.form['website_link']
+
+        try:
+          db.session.commit()
+          page_cache.invalidate(*venue_page_tags(venue_id))
+        except:
+          db.session.rollback()
+          flash('An error occurred. Venue ' + request.form['name'] + ' could not be updated.')
+        finally:
+          db.session.close()
+
+        return redirect(url_for('.show_venue', venue_id=venue_id))
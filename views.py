@@ -0,0 +1,133 @@
+from datetime import datetime
+
+from flask import Response, current_app, render_template, request, stream_with_context
+
+from cache import page_cache
+from conditional import conditional
+from model import db, Venue, Artist, Show
+from search import search_backend
+
+#----------------------------------------------------------------------------#
+# Helpers shared by the venues, artists and shows blueprints.
+#----------------------------------------------------------------------------#
+
+def stream_template(template_name, **context):
+  # render_template as a streamed response, sent in chunks of about
+  # STREAM_CHUNK_SIZE characters as the template (and the rows it iterates)
+  # produces them
+  app = current_app._get_current_object()
+  app.update_template_context(context)
+  template = app.jinja_env.get_or_select_template(template_name)
+  return Response(stream_with_context(buffered(template.generate(context), app.config['STREAM_CHUNK_SIZE'])))
+
+
+def buffered(chunks, size):
+  buffer, length = [], 0
+  for chunk in chunks:
+    buffer.append(chunk)
+    length += len(chunk)
+    if length >= size:
+      yield ''.join(buffer)
+      buffer, length = [], 0
+  if buffer:
+    yield ''.join(buffer)
+
+
+def request_page():
+  # 1-based page number from the submitted form or the query string
+  try:
+    return max(int(request.values.get('page', 1)), 1)
+  except ValueError:
+    return 1
+
+
+def partition_shows(shows, show_data):
+  # splits already loaded shows into (past, upcoming) lists of show_data(show),
+  # each in start time order; a cached page built from the split is valid
+  # until the first upcoming show starts
+  current_time = datetime.utcnow()
+  past_shows, upcoming_shows = [], []
+  for show in sorted(shows, key=lambda show: show.start_time):
+    if show.start_time > current_time:
+      if not upcoming_shows:
+        page_cache.expire_at(show.start_time)
+      upcoming_shows.append(show_data(show))
+    else:
+      past_shows.append(show_data(show))
+  return past_shows, upcoming_shows
+
+
+def page_state(*queries):
+  # evaluates several scalar queries in one round trip
+  return db.session.query(*[query.label('value_{}'.format(i)) for i, query in enumerate(queries)]).one()
+
+
+def table_state(model, *criteria):
+  return (
+    db.session.query(db.func.max(model.updated_at)).filter(*criteria),
+    db.session.query(db.func.count(model.id)).filter(*criteria))
+
+
+def shows_state(*criteria):
+  # shows matching criteria, the artists and venues they render, and the last
+  # start_time to have passed, since that moves a show from upcoming to past
+  past = db.session.query(db.func.max(Show.start_time)).filter(Show.start_time <= datetime.utcnow(), *criteria)
+  if not criteria:
+    # every show: index-only max(updated_at) of the three tables, no joins and
+    # no count; deleting shows refreshes the other side's counters, which
+    # bumps its updated_at
+    return (
+      db.session.query(db.func.max(Show.updated_at)),
+      db.session.query(db.func.max(Artist.updated_at)),
+      db.session.query(db.func.max(Venue.updated_at)),
+      past)
+  return table_state(Show, *criteria) + (
+    db.session.query(db.func.max(Artist.updated_at)).join(Show, Show.artist_id == Artist.id).filter(*criteria),
+    db.session.query(db.func.max(Venue.updated_at)).join(Show, Show.venue_id == Venue.id).filter(*criteria),
+    past)
+
+
+def search_with_upcoming_counts(model, search_term, page):
+  # one page of matches ranked by relevance, with their stored upcoming show
+  # counts, so the cost of a response depends on the page size only
+  per_page = current_app.config['SEARCH_PAGE_SIZE']
+  count, ids = search_backend().search(model, search_term.strip(), per_page, (page - 1) * per_page)
+
+  rows = db.session.query(model.id, model.name, model.upcoming_shows_count) \
+    .filter(model.id.in_(ids)).all() if ids else []
+  position = {id: i for i, id in enumerate(ids)}
+  rows = sorted(rows, key=lambda row: position[row[0]])
+
+  return {
+    "count": count,
+    "page": page,
+    "pages": max((count + per_page - 1) // per_page, 1),
+    "data": [{
+      "id": id,
+      "name": name,
+      "num_upcoming_shows": num_upcoming_shows
+      } for id, name, num_upcoming_shows in rows]
+    }
+
+#----------------------------------------------------------------------------#
+# Home and error pages, registered on the app by create_app.
+#----------------------------------------------------------------------------#
+
+def index_state():
+  return page_state(*table_state(Venue) + table_state(Artist))
+
+
+@conditional(index_state)
+@page_cache.cached('home')
+def index():
+  venues = Venue.query.order_by(db.desc(Venue.id)).limit(10).all()
+  artists = Artist.query.order_by(db.desc(Artist.id)).limit(10).all()
+  return render_template('pages/home.html', venues=venues, artists=artists)
+
+
+def not_found_error(error):
+    return render_template('errors/404.html'), 404
+
+
+def server_error(error):
+    return render_template('errors/500.html'), 500
@@ -0,0 +1,118 @@
+import os
+import tempfile
+import time
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from jinja2 import FileSystemBytecodeCache
+from sqlalchemy.orm import configure_mappers
+
+from dates import FORMATS, compiled_pattern
+from model import db, Venue, Artist, Show, Genre
+from search import search_backend
+
+#----------------------------------------------------------------------------#
+# Bytecode cache.
+#----------------------------------------------------------------------------#
+
+class SharedBytecodeCache(FileSystemBytecodeCache):
+    """FileSystemBytecodeCache safe for several worker processes.
+
+    Entries are written to a temporary file and renamed into place, so a
+    worker never loads one that another worker is halfway through writing.
+    Entries are keyed on the template's source, so a deploy that changes a
+    template simply adds a new one.
+    """
+
+    def dump_bytecode(self, bucket):
+        fd, path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                bucket.write_bytecode(file)
+            os.replace(path, self._get_cache_filename(bucket))
+        except BaseException:
+            os.unlink(path)
+            raise
+
+
+def init_bytecode_cache(app):
+    directory = app.config.get('JINJA_BYTECODE_CACHE_DIR')
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        app.jinja_env.bytecode_cache = SharedBytecodeCache(directory)
+
+#----------------------------------------------------------------------------#
+# Warmup.
+#----------------------------------------------------------------------------#
+
+MODELS = (Genre, Venue, Artist, Show)
+
+
+def compile_templates(app):
+    names = [name for name in app.jinja_env.list_templates() if name.endswith('.html')]
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
+
+
+def first_queries():
+    # mapper configuration, statement compilation and, for SQLite, the
+    # in-process search index all happen on a model's first query
+    configure_mappers()
+    for model in MODELS:
+        db.session.query(model).first()
+    for model in (Venue, Artist):
+        search_backend().search(model, 'warmup', 1, 0)
+    db.session.rollback()
+    return len(MODELS)
+
+
+def form_classes():
+    # forms.py imports Flask-WTF and Babel; load them before the first form view
+    from forms import ShowForm, VenueForm, ArtistForm
+    return len((ShowForm, VenueForm, ArtistForm))
+
+
+def date_patterns():
+    locales = current_app.extensions['date_formatter'].locales
+    for format in FORMATS:
+        for locale in locales:
+            compiled_pattern(format, locale)
+    return len(FORMATS) * len(locales)
+
+
+def warmup(app):
+    """Does the one-off work of a worker's first requests ahead of time.
+
+    Returns (step, count, seconds) for each step. The connection pool is
+    emptied afterwards, so a preloading gunicorn master does not hand its
+    connections to the workers it forks.
+    """
+    timings = []
+    with app.app_context():
+        for step, function in (('templates', lambda: compile_templates(app)),
+                               ('models', first_queries),
+                               ('forms', form_classes),
+                               ('date patterns', date_patterns)):
+            start = time.perf_counter()
+            count = function()
+            timings.append((step, count, time.perf_counter() - start))
+        db.session.remove()
+        db.engine.dispose()
+    return timings
+
+#----------------------------------------------------------------------------#
+# Command.
+#----------------------------------------------------------------------------#
+
+@click.command('warmup')
+@with_appcontext
+def warmup_command():
+    """Precompile every template and run each model's first query.
+
+    With JINJA_BYTECODE_CACHE_DIR set this also fills the bytecode cache, so
+    run it once per deploy before starting the workers.
+    """
+    for step, count, seconds in warmup(current_app._get_current_object()):
+        click.echo('{:<14} {:>4} in {:.3f}s'.format(step, count, seconds))
@@ -0,0 +1,15 @@
+"""WSGI entry point, and the app the flask command and scripts load.
+
+    gunicorn wsgi:app --preload --workers 4
+"""
+import gc
+
+from app import create_app
+
+app = create_app()
+
+# Everything loaded so far lives as long as the process. Moving it out of the
+# garbage collector's reach stops collections in the workers a preloading
+# server (gunicorn --preload) forks from writing to, and so copying, the
+# memory pages they share with the master.
+gc.freeze()